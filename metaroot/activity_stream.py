@@ -1,14 +1,31 @@
+import json
 import os
+import queue
 import sqlite3
-import datetime
-import yaml
+import threading
+import time
+import weakref
+from urllib.request import pathname2url
 from metaroot.config import get_config
 from metaroot.api.result import Result
 
+# The same SQL literal is always passed so that sqlite3 reuses its cached prepared statement
+_INSERT_SQL = 'INSERT INTO events VALUES(?,?,?,?,?,?)'
+
+# Encoded arguments and messages longer than this many characters are truncated to keep rows small
+_MAX_ENCODED = 4096
+
+# Sentinel that tells the writer thread to write any pending events and exit
+_STOP = object()
+
+# Write errors kept for flush() and close() to raise; later errors are discarded until those have been reported
+_MAX_ERRORS = 100
+
 
 class ActivityStream:
     """
-    A class that encapsulates recording events to database for administrative review or intervention.
+    A class that encapsulates recording events to database for administrative review or intervention. Event times are
+    stored as integer microseconds since the epoch, and event arguments and messages as JSON.
     """
 
     # Static attributes for event types
@@ -16,49 +33,380 @@ class ActivityStream:
     WARN = 1
     INFO = 2
 
-    def __init__(self):
+    def __init__(self, max_batch: int = 1000, max_delay_s: float = 0.5, max_queued: int = 100000,
+                 drop_on_overflow: bool = False):
         """
         Initialize a new activity stream. Creates the database if it does not exist.
+
+        Events are handed to a dedicated writer thread through a bounded queue so that callers do not wait for the
+        database. The writer thread owns the database connection and writes queued events in batches.
+
+        Parameters
+        ----------
+        max_batch: int
+            The maximum number of events written to the database in a single transaction
+        max_delay_s: float
+            The maximum number of seconds an event is held by the writer before a write to the database is triggered
+        max_queued: int
+            The maximum number of events waiting for the writer thread
+        drop_on_overflow: bool
+            If True, events are discarded when the queue is full. Otherwise callers block until there is room.
+
+        Raises
+        ---------
+        Exception
+            if the database could not be opened or created
         """
         config = get_config(self.__class__.__name__)
 
+        self._drop_on_overflow = drop_on_overflow
+        self._q = queue.Queue(maxsize=max_queued)
+        self._closed = False
+
+        # The writer must not hold a reference to self, otherwise the stream could never be garbage collected
         db_file = config.get_activity_stream_db()
+        ready = threading.Event()
+        self._errors = []
+        self._writer = threading.Thread(target=ActivityStream._writer_loop,
+                                        args=(db_file, self._q, max_batch, max_delay_s, ready, self._errors),
+                                        daemon=True)
+        self._writer.start()
+        ready.wait()
+        self._raise_errors()
+
+        # Each thread that queries the stream gets its own read-only connection, so readers see a consistent WAL
+        # snapshot without waiting on the writer thread
+        self._read_uri = 'file:{0}?mode=ro'.format(pathname2url(os.path.abspath(db_file)))
+        self._readers = threading.local()
+
+        # Every reader connection is also kept here so that close() can close connections opened by other threads
+        self._reader_conns = []
+        self._reader_lock = threading.Lock()
+
+        # Safety net for streams that are never closed; runs at garbage collection or interpreter exit
+        self._finalizer = weakref.finalize(self, ActivityStream._stop_writer, self._q, self._writer,
+                                           self._reader_conns, self._reader_lock)
+
+    def __enter__(self):
+        """
+        Stub for contexts. No setup required.
+        """
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """
+        Writes any queued events and closes the stream when the with block is exited
+        """
+        self.close()
+
+    def close(self):
+        """
+        Writes any queued events, stops the writer thread and closes the database connections. Calling close() more
+        than once has no effect. Once closed, the stream raises ValueError if events are added, it is flushed or it
+        is queried.
+        """
+        with self._reader_lock:
+            self._closed = True
+        self._finalizer()
+        self._raise_errors()
+
+    @staticmethod
+    def _stop_writer(q: queue.Queue, writer: threading.Thread, reader_conns: list, reader_lock: threading.Lock):
+        """
+        Tells the writer thread to write any pending events and exit, waits for it to do so, and closes the reader
+        connections
+
+        Parameters
+        ----------
+        q: queue.Queue
+            The writer thread's queue
+        writer: threading.Thread
+            The writer thread
+        reader_conns: list
+            The read-only connections opened by query()
+        reader_lock: threading.Lock
+            The lock guarding reader_conns
+        """
+        q.put(_STOP)
+        writer.join()
+        with reader_lock:
+            for conn in reader_conns:
+                conn.close()
+            del reader_conns[:]
+
+    @staticmethod
+    def _connect(db_file: str) -> sqlite3.Connection:
+        """
+        Opens the database, creating it if it does not exist
+
+        Parameters
+        ----------
+        db_file: str
+            Path to the database file
+
+        Returns
+        -------
+        sqlite3.Connection
+            The open connection
+        """
         need_to_create_tables = True
         if os.path.exists(db_file):
             need_to_create_tables = False
 
         # If the database does not exist, create it
-        self._conn = sqlite3.connect(db_file)
+        # Transactions are managed explicitly by _write rather than implicitly by the sqlite3 module
+        conn = sqlite3.connect(db_file, cached_statements=64, isolation_level=None)
+
+        # Write-ahead logging avoids a rollback journal fsync for every event, and with WAL synchronous=NORMAL is
+        # still safe against corruption (only the most recent commits can be lost on power failure)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute("PRAGMA cache_size=-20000")
+
         if need_to_create_tables:
-            self._conn.execute('''CREATE TABLE events (eventtime timestamp, type integer, action text, arguments text, status integer, message text)''')
-            self._conn.commit()
+            conn.execute('''CREATE TABLE events (eventtime integer, type integer, action text, arguments text, status integer, message text)''')
 
-    def __del__(self):
+        # Indexes for review queries such as "errors in the last hour". Created on every connect so that databases
+        # created before the indexes existed also receive them.
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_events_time ON events(eventtime)')
+        conn.execute('CREATE INDEX IF NOT EXISTS idx_events_type_time ON events(type, eventtime)')
+        return conn
+
+    @staticmethod
+    def _writer_loop(db_file: str, q: queue.Queue, max_batch: int, max_delay_s: float, ready: threading.Event,
+                     errors: list):
         """
-        Commits any pending changes and closes database connection.
+        Body of the writer thread. Collects queued events until max_batch events are pending, max_delay_s has
+        elapsed since the first pending event, or a flush/stop is requested, then writes them in one transaction.
+
+        Parameters
+        ----------
+        db_file: str
+            Path to the database file
+        q: queue.Queue
+            Queue of event tuples and control items
+        max_batch: int
+            The maximum number of events written in a single transaction
+        max_delay_s: float
+            The maximum number of seconds an event is held before it is written
+        ready: threading.Event
+            Set once the database is open (or failed to open)
+        errors: list
+            Receives the exception if the database could not be opened
         """
-        self._conn.commit()
-        self._conn.close()
+        try:
+            conn = ActivityStream._connect(db_file)
+        except Exception as e:
+            errors.append(e)
+            ready.set()
+            return
+        ready.set()
+
+        buf = []
+        stop = False
+        while not stop:
+            item = q.get()
+            deadline = time.monotonic() + max_delay_s
+            while True:
+                if item is _STOP:
+                    stop = True
+                    break
+                elif isinstance(item, threading.Event):
+                    ActivityStream._write(conn, buf, errors)
+                    item.set()
+                    break
+                else:
+                    buf.append(item)
+                    if len(buf) >= max_batch:
+                        break
 
-    def _insert(self, values: tuple) -> bool:
+                try:
+                    item = q.get(timeout=max(0.0, deadline - time.monotonic()))
+                except queue.Empty:
+                    break
+            ActivityStream._write(conn, buf, errors)
+
+        conn.close()
+
+    @staticmethod
+    def _encode(value: object) -> str:
         """
-        Inserts a new event to the database
+        Encodes an event argument or result for storage. Called by the writer thread so that callers do not pay for
+        serialization.
+
         Parameters
         ----------
-        values: tuple
-            six values in the correct order to bind placeholders
+        value: object
+            A string, a Result, or any other object that can be represented as JSON
+
+        Returns
+        -------
+        str
+            The value unchanged if it is a string, otherwise its compact JSON representation. Either is truncated to
+            _MAX_ENCODED characters.
+        """
+        if not isinstance(value, str):
+            if isinstance(value, Result):
+                value = value.to_transport_format()
+            try:
+                value = json.dumps(value, separators=(',', ':'), default=str)
+            except (TypeError, ValueError):
+                value = str(value)
+        return value[:_MAX_ENCODED]
+
+    @staticmethod
+    def _write(conn: sqlite3.Connection, buf: list, errors: list):
+        """
+        Writes all events in buf to the database in a single transaction, and clears buf
+
+        Parameters
+        ----------
+        conn: sqlite3.Connection
+            The writer thread's database connection
+        buf: list
+            Event tuples to write
+        errors: list
+            Receives any exception raised while writing, so that it can be re-raised by flush() or close()
+        """
+        if len(buf) > 0:
+            try:
+                rows = [(eventtime, event_type, action,
+                         ActivityStream._encode(arguments),
+                         status,
+                         ActivityStream._encode(message))
+                        for eventtime, event_type, action, arguments, status, message in buf]
+
+                # Take the write lock once for the whole batch
+                conn.execute('BEGIN IMMEDIATE')
+                try:
+                    conn.executemany(_INSERT_SQL, rows)
+                    conn.execute('COMMIT')
+                except Exception:
+                    conn.execute('ROLLBACK')
+                    raise
+            except Exception as e:
+                if len(errors) < _MAX_ERRORS:
+                    errors.append(e)
+            buf.clear()
+
+    def _check_open(self):
+        """
+        Raises ValueError if the stream has been closed, or its writer thread has stopped (e.g., at interpreter exit)
+        """
+        if self._closed or not self._writer.is_alive():
+            raise ValueError("ActivityStream is closed")
+
+    def _raise_errors(self):
+        """
+        Re-raises the oldest exception encountered by the writer thread, if any
+        """
+        if len(self._errors) > 0:
+            raise self._errors.pop(0)
+
+    def flush(self) -> bool:
+        """
+        Blocks until all events queued before the call have been written to the database
 
         Returns
         -------
         True
             Always returns True
+
+        Raises
+        ---------
+        ValueError
+            if the stream is closed
+        Exception
+            if the writer thread encountered an exception while writing to the database
+        """
+        self._check_open()
+        done = threading.Event()
+        self._q.put(done)
+
+        # If the stream is closed by another thread, the writer may exit without reaching the request
+        while not done.wait(timeout=0.5):
+            if not self._writer.is_alive() and not done.is_set():
+                raise ValueError("ActivityStream is closed")
+        self._raise_errors()
+        return True
+
+    def query(self, sql: str, params: tuple = ()) -> list:
+        """
+        Runs a read-only query against the events table. Events that are still queued for the writer thread are not
+        visible; call flush() first if they are required.
+
+        Parameters
+        ----------
+        sql: str
+            A SELECT statement
+        params: tuple
+            Values to bind to placeholders in sql
+
+        Returns
+        -------
+        list
+            The rows returned by the query as tuples
+
+        Raises
+        ---------
+        ValueError
+            if the stream is closed
+        Exception
+            if the query failed, including any attempt to modify the database
+        """
+        if self._closed:
+            raise ValueError("ActivityStream is closed")
+        conn = getattr(self._readers, "conn", None)
+        if conn is None:
+            with self._reader_lock:
+                if self._closed:
+                    raise ValueError("ActivityStream is closed")
+                # Only the creating thread uses the connection, but close() may close it from another thread
+                conn = sqlite3.connect(self._read_uri, uri=True, check_same_thread=False)
+                self._reader_conns.append(conn)
+            self._readers.conn = conn
+        return conn.execute(sql, params).fetchall()
+
+    def _insert(self, values: tuple, sync: bool = False) -> bool:
+        """
+        Queues a new event to be written to the database by the writer thread. Errors writing earlier events are not
+        raised here, since they do not concern this event; they are raised by flush() and close().
+
+        Parameters
+        ----------
+        values: tuple
+            six values in the correct order to bind placeholders. The arguments and message values are encoded by
+            the writer thread, so they must not be modified after the call
+        sync: bool
+            If True, the event (and any queued events) are written to the database before returning
+
+        Returns
+        -------
+        bool
+            True if the event was queued, False if it was dropped because the queue was full
+
+        Raises
+        ---------
+        ValueError
+            if the stream is closed
+        Exception
+            if sync is True and the writer thread encountered an exception while writing to the database
         """
-        self._conn.execute('INSERT INTO events VALUES(?,?,?,?,?,?)',
-                           values)
-        self._conn.commit()
+        self._check_open()
+        if self._drop_on_overflow and not sync:
+            try:
+                self._q.put_nowait(values)
+            except queue.Full:
+                return False
+        else:
+            self._q.put(values)
+
+        if sync:
+            self.flush()
         return True
 
-    def info(self, action: str, params: object) -> bool:
+    def info(self, action: str, params: object, sync: bool = False) -> bool:
         """
         Add an informational entry to the database
 
@@ -68,6 +416,8 @@ class ActivityStream:
             A unique identifier for the action, usually ${method_name}:${class name}
         params : object
             The arguments to the method as scalar, list or dict
+        sync: bool
+            If True, the entry is written to the database before returning rather than buffered
 
         Returns
         ---------
@@ -79,14 +429,15 @@ class ActivityStream:
         Exception
             if the database if an underlying operation raised an exception
         """
-        return self._insert((datetime.datetime.now(),
+        return self._insert((int(time.time() * 1000000),
                              ActivityStream.INFO,
                              action,
-                             yaml.safe_dump(params),
+                             params,
                              0,
-                             ""))
+                             ""),
+                            sync)
 
-    def error(self, action: str, params: object, result: Result) -> bool:
+    def error(self, action: str, params: object, result: Result, sync: bool = False) -> bool:
         """
         Add an error entry to the database
 
@@ -98,6 +449,8 @@ class ActivityStream:
             The arguments to the method as scalar, list or dict
         result: metaroot.api.Result
             The Result of the failed operation that contains more granular information about the error
+        sync: bool
+            If True, the entry is written to the database before returning rather than buffered
 
         Returns
         ---------
@@ -109,14 +462,15 @@ class ActivityStream:
         Exception
             if the database if an underlying operation raised an exception
         """
-        return self._insert((datetime.datetime.now(),
+        return self._insert((int(time.time() * 1000000),
                              ActivityStream.ERROR,
                              action,
-                             yaml.safe_dump(params),
+                             params,
                              result.status,
-                             yaml.safe_dump(result.to_transport_format())))
+                             result),
+                            sync)
 
-    def record(self, action: str, params: object, result: Result) -> bool:
+    def record(self, action: str, params: object, result: Result, sync: bool = False) -> bool:
         """
         Adds an entry to the database as info if result.is_success() and as error otherwise
 
@@ -128,6 +482,8 @@ class ActivityStream:
             The arguments to the method as scalar, list or dict
         result: metaroot.api.Result
             The Result of the operation
+        sync: bool
+            If True, the entry is written to the database before returning rather than buffered
 
         Returns
         ---------
@@ -140,6 +496,6 @@ class ActivityStream:
             if the database if an underlying operation raised an exception
         """
         if result.is_success():
-            return self.info(action, params)
+            return self.info(action, params, sync)
         else:
-            return self.error(action, params, result)
+            return self.error(action, params, result, sync)
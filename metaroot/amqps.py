@@ -1,21 +1,41 @@
 import ssl
+import functools
 from metaroot.config import Config
 
+# Maps SSL_VERIFY_MODE configuration values to ssl verification modes
+_VERIFY_MODES = {"NONE": ssl.CERT_NONE,
+                 "OPTIONAL": ssl.CERT_OPTIONAL,
+                 "REQUIRED": ssl.CERT_REQUIRED}
 
-def get_ssl_context_from_config(config: Config) -> ssl.SSLContext:
-    cxt = ssl.SSLContext()
 
-    cxt.verify_mode = ssl.CERT_REQUIRED
-    if config.get_ssl_verify_mode() == "NONE":
-        cxt.verify_mode = ssl.CERT_NONE
-    elif config.get_ssl_verify_mode() == "OPTIONAL":
-        cxt.verify_mode = ssl.CERT_OPTIONAL
-    elif config.get_ssl_verify_mode() == "REQUIRED":
-        cxt.verify_mode = ssl.CERT_REQUIRED
+@functools.lru_cache(maxsize=8)
+def _build_ctx(verify_mode: int, check_hostname: bool) -> ssl.SSLContext:
+    """
+    Builds an SSL context for connecting to the message queue server. Contexts are cached by their settings so that
+    OpenSSL state and CA certificates are only loaded once per process, rather than on every connection.
+
+    Parameters
+    ----------
+    verify_mode: int
+        One of ssl.CERT_NONE, ssl.CERT_OPTIONAL or ssl.CERT_REQUIRED
+    check_hostname: bool
+        True if the server hostname should be matched against its certificate
+
+    Returns
+    ----------
+    ssl.SSLContext
+        A context that is shared by all callers requesting the same settings
+    """
+    cxt = ssl.create_default_context(purpose=ssl.Purpose.SERVER_AUTH)
 
-    if config.get_ssl_nocheck_hostname():
-        cxt.check_hostname = False
-    else:
-        cxt.check_hostname = True
+    # check_hostname must be disabled before verification can be relaxed
+    cxt.check_hostname = False
+    cxt.verify_mode = verify_mode
+    cxt.check_hostname = check_hostname
 
     return cxt
+
+
+def get_ssl_context_from_config(config: Config) -> ssl.SSLContext:
+    return _build_ctx(_VERIFY_MODES.get(config.get_ssl_verify_mode(), ssl.CERT_REQUIRED),
+                      not config.get_ssl_nocheck_hostname())
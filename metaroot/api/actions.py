@@ -0,0 +1,61 @@
+from enum import IntEnum
+
+
+class Action(IntEnum):
+    """
+    Integer codes for the actions that can be requested of a manager. Member names are the names of the manager
+    methods they map to. Values are part of the wire protocol, so existing values must never be changed or reused;
+    new actions are appended.
+    """
+    add_group = 1
+    add_user = 2
+    associate_user_to_group = 3
+    delete_group = 4
+    delete_user = 5
+    disassociate_user_from_group = 6
+    disassociate_users_from_group = 7
+    set_user_default_group = 8
+    update_group = 9
+    update_user = 10
+    exists_group = 11
+    exists_user = 12
+    get_group = 13
+    get_members = 14
+    get_user = 15
+    list_users = 16
+    validate_users = 17
+    roles_user = 18
+    list_groups = 19
+    add_users = 20
+    delete_users = 21
+    associate_users_to_groups = 22
+    get_group_if_exists = 23
+    get_user_if_exists = 24
+
+
+# Method names indexed by action code, so that servers can translate an integer action with a list index
+ACTION_NAMES = [None] * (max(Action) + 1)
+for _action in Action:
+    ACTION_NAMES[_action] = _action.name
+ACTION_NAMES = tuple(ACTION_NAMES)
+
+
+def action_name(action: object) -> str:
+    """
+    Translates the action of a message to the name of the method it requests
+
+    Parameters
+    ----------
+    action: object
+        The 'action' value of a message, either a method name or an integer Action code
+
+    Returns
+    -------
+    str
+        The method name, or None if action is an integer that is not a known Action code
+    """
+    if type(action) is int:
+        if 0 < action < len(ACTION_NAMES):
+            return ACTION_NAMES[action]
+        return None
+    return action
@@ -1,4 +1,134 @@
+import contextlib
+import enum
+import functools
+import sys
+import threading
+import yaml
+from concurrent.futures import Future
 from metaroot.api.result import Result
+from metaroot.wire import ENCODING_ERRORS, encode_with_prefix
+
+# Key that add_* requests must define, interned so that lookups can short circuit on identity
+_NAME = sys.intern('name')
+
+# The constant part of each request is encoded once, so that only the arguments are encoded on each call
+_ADD_GROUP = yaml.safe_dump({'action': 'add_group'})
+_ADD_USER = yaml.safe_dump({'action': 'add_user'})
+_ADD_USERS = yaml.safe_dump({'action': 'add_users'})
+_ASSOCIATE_USER_TO_GROUP = yaml.safe_dump({'action': 'associate_user_to_group'})
+_ASSOCIATE_USERS_TO_GROUPS = yaml.safe_dump({'action': 'associate_users_to_groups'})
+_DELETE_GROUP = yaml.safe_dump({'action': 'delete_group'})
+_DELETE_USER = yaml.safe_dump({'action': 'delete_user'})
+_DELETE_USERS = yaml.safe_dump({'action': 'delete_users'})
+_DISASSOCIATE_USER_FROM_GROUP = yaml.safe_dump({'action': 'disassociate_user_from_group'})
+_DISASSOCIATE_USERS_FROM_GROUP = yaml.safe_dump({'action': 'disassociate_users_from_group'})
+_SET_USER_DEFAULT_GROUP = yaml.safe_dump({'action': 'set_user_default_group'})
+_UPDATE_GROUP = yaml.safe_dump({'action': 'update_group'})
+_UPDATE_USER = yaml.safe_dump({'action': 'update_user'})
+
+# Requests whose Result carries no payload, which a client may send without waiting for a reply
+_NO_REPLY = frozenset({_ASSOCIATE_USER_TO_GROUP,
+                       _ASSOCIATE_USERS_TO_GROUPS,
+                       _DELETE_GROUP,
+                       _DELETE_USER,
+                       _DELETE_USERS,
+                       _DISASSOCIATE_USER_FROM_GROUP,
+                       _DISASSOCIATE_USERS_FROM_GROUP,
+                       _SET_USER_DEFAULT_GROUP})
+
+
+class CallKind(enum.Enum):
+    """
+    How a request that returns no payload is sent. See BaseClient#call_kind.
+    """
+    # The default of the client (e.g., MethodClientAPI(oneway=True))
+    AUTO = 0
+    # Wait for the Result of the backend operations
+    RPC = 1
+    # Do not wait for a reply; the Result reflects delivery of the request only
+    ONE_WAY = 2
+
+
+# Lists longer than this are split across several requests, keeping each message well under broker size limits
+_CHUNK_SIZE = 5000
+
+
+@functools.lru_cache(maxsize=None)
+def _prefix_action(prefix: str) -> str:
+    """
+    Recovers the action name from the pre-encoded constant part of a request
+
+    Parameters
+    ----------
+    prefix: str
+        The YAML encoding of the constant part of a request
+
+    Returns
+    -------
+    str
+        The value of the request's 'action' key
+    """
+    return yaml.safe_load(prefix)['action']
+
+
+def _resolve_batch(futures: list, result: Result):
+    """
+    Resolves the Futures of the requests in a batch from the Result of the batch
+
+    Parameters
+    ----------
+    futures: list
+        The Future of each request, in the order the requests were sent
+    result: Result
+        The Result of the batch. If its response is a list with one entry per request, each Future resolves to the
+        corresponding entry. Otherwise (e.g., the batch could not be delivered) every Future resolves to result.
+    """
+    if isinstance(result.response, list) and len(result.response) == len(futures):
+        for future, response in zip(futures, result.response):
+            future.set_result(Result.from_transport_format(response))
+    else:
+        for future in futures:
+            future.set_result(result)
+
+
+def _combine_chunks(results: list) -> Result:
+    """
+    Combines the Results of the requests a chunked request was split into
+
+    Parameters
+    ----------
+    results: list
+        The Result, or Future resolving to the Result, of each chunk
+
+    Returns
+    -------
+    Result
+        Result.status is the sum of the status of each chunk, and Result.response is a list of the transport format
+        of each chunk's Result. If any chunk returned a Future, a Future resolving to that Result is returned instead.
+    """
+    def combine(chunk_results):
+        return Result(sum(result.status for result in chunk_results),
+                      [result.to_transport_format() for result in chunk_results])
+
+    futures = [result for result in results if isinstance(result, Future)]
+    if len(futures) == 0:
+        return combine(results)
+
+    combined = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def on_done(_):
+        with lock:
+            remaining[0] = remaining[0] - 1
+            if remaining[0] > 0:
+                return
+        combined.set_result(combine([result.result() if isinstance(result, Future) else result
+                                     for result in results]))
+
+    for future in futures:
+        future.add_done_callback(on_done)
+    return combined
 
 
 class BaseClient:
@@ -6,6 +136,8 @@ class BaseClient:
     Client for performing administrative tasks in metaroot backend infrastructure.
     """
 
+    __slots__ = ('client', '_send', '_send_encoded', '_send_oneway', '_oneway', '_oneway_default', '_batch')
+
     def __init__(self, client):
         """
         Initialize the API to use a Producer (Events) or RPCClient (RPC) for communication
@@ -13,10 +145,24 @@ class BaseClient:
         Parameters
         ----------
         client
-            An instance of an object with a "send" method
+            An instance of an object with "send" and "send_encoded" methods
         """
         self.client = client
 
+        # Bound once here rather than looked up through self.client on every request
+        self._send = client.send
+        self._send_encoded = client.send_encoded
+
+        # Sends _NO_REPLY requests without waiting for a reply, if the client supports it
+        self._send_oneway = getattr(client, "send_encoded_oneway", None)
+
+        # Whether _NO_REPLY requests are currently sent with _send_oneway, and the client default for CallKind.AUTO
+        self._oneway = False
+        self._oneway_default = False
+
+        # List of (action, fields, Future) while requests are being collected by batch(), otherwise None
+        self._batch = None
+
     def __enter__(self):
         """
         Connect the RPC client to the message queue if manager is instantiated by a with statement
@@ -45,7 +191,198 @@ class BaseClient:
             Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
             of the backend operations (MethodAPI)
         """
-        return self.client.send(request)
+        return self._send(request)
+
+    def _call_async(self, request: object) -> Future:
+        """
+        Wrapper around the client send_async method, for clients that support pipelined requests
+
+        Parameters
+        ----------
+        request: object
+            A dictionary the defines the request, or a simple string
+
+        Returns
+        ---------
+        Future
+            Resolves to the Result that _call would have returned
+        """
+        return self.client.send_async(request)
+
+    def _call_encoded(self, prefix: str, fields: dict) -> Result:
+        """
+        Encodes and sends a request whose constant part was encoded ahead of time
+
+        Parameters
+        ----------
+        prefix: str
+            The YAML encoding of the constant part of the request (i.e., the 'action')
+        fields: dict
+            The remaining keys of the request
+
+        Returns
+        ---------
+        Result
+            Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
+            of the backend operations (MethodAPI)
+        """
+        if self._batch is not None:
+            future = Future()
+            self._batch.append((_prefix_action(prefix), fields, future))
+            return future
+        return self._send_request(prefix, fields, self._oneway)
+
+    def _send_request(self, prefix: str, fields: dict, oneway: bool) -> Result:
+        """
+        Encodes and sends a request immediately, regardless of any batch() or call_kind() currently active on the
+        client
+
+        Parameters
+        ----------
+        prefix: str
+            The YAML encoding of the constant part of the request (i.e., the 'action')
+        fields: dict
+            The remaining keys of the request
+        oneway: bool
+            If True and the request returns no payload, send it without waiting for a reply (if the client supports it)
+
+        Returns
+        ---------
+        Result
+            Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
+            of the backend operations (MethodAPI)
+        """
+        try:
+            message = encode_with_prefix(prefix, fields)
+        except ENCODING_ERRORS:
+            return Result(453, "Could not serialize the message")
+        if oneway and self._send_oneway is not None and prefix in _NO_REPLY:
+            return self._send_oneway(message)
+        return self._send_encoded(message)
+
+    def _call_chunked(self, prefix: str, fields: dict, key: str, call=None) -> Result:
+        """
+        Sends a request whose list argument is split into chunks of at most _CHUNK_SIZE elements, one request per chunk
+
+        Parameters
+        ----------
+        prefix: str
+            The YAML encoding of the constant part of the request (i.e., the 'action')
+        fields: dict
+            The remaining keys of the request
+        key: str
+            The key of fields whose value is the list to split
+        call: callable
+            Sends each request, given its prefix and fields. Defaults to _call_encoded.
+
+        Returns
+        ---------
+        Result
+            The Result of the request if the list did not need to be split. Otherwise, Result.status is the sum of the
+            status of each chunk and Result.response is a list of the transport format of each chunk's Result.
+        """
+        if call is None:
+            call = self._call_encoded
+
+        values = fields[key]
+        if len(values) <= _CHUNK_SIZE:
+            return call(prefix, fields)
+
+        results = []
+        for start in range(0, len(values), _CHUNK_SIZE):
+            chunk = dict(fields)
+            chunk[key] = values[start:start + _CHUNK_SIZE]
+            results.append(call(prefix, chunk))
+        return _combine_chunks(results)
+
+    @contextlib.contextmanager
+    def batch(self):
+        """
+        Collects the requests made inside a with block and sends them as a single message when the block exits, so
+        that N requests cost one round trip instead of N. Inside the block, methods return a Future that resolves to
+        the Result of the request once the batch has been sent. If the block raises an exception, the collected
+        requests are discarded and their Futures are cancelled.
+
+        Yields
+        -------
+        BaseClient
+            This client
+        """
+        if self._batch is not None:
+            # Already collecting, so requests join the enclosing batch
+            yield self
+            return
+
+        self._batch = []
+        try:
+            yield self
+        except BaseException:
+            for _, _, future in self._batch:
+                future.cancel()
+            self._batch = None
+            raise
+        try:
+            self.send_batch()
+        finally:
+            self._batch = None
+
+    @contextlib.contextmanager
+    def call_kind(self, kind: CallKind):
+        """
+        Chooses, for the requests made inside a with block, whether requests that return no payload
+        (delete_*, associate_*, disassociate_* and set_user_default_group) wait for the Result of the backend
+        operations. Other requests, and clients that cannot send without waiting for a reply, are unaffected.
+
+        Parameters
+        ----------
+        kind: CallKind
+            CallKind.ONE_WAY to return as soon as the request is sent, CallKind.RPC to wait for the Result, or
+            CallKind.AUTO for the client default
+
+        Yields
+        -------
+        BaseClient
+            This client
+        """
+        previous = self._oneway
+        if kind is CallKind.AUTO:
+            self._oneway = self._oneway_default
+        else:
+            self._oneway = kind is CallKind.ONE_WAY
+        try:
+            yield self
+        finally:
+            self._oneway = previous
+
+    def send_batch(self) -> Result:
+        """
+        Sends the requests collected so far by batch() as a single message and resolves their Futures
+
+        Returns
+        -------
+        Result
+            The Result of the batch as a whole. For the MethodAPI, Result.status is the sum of the status of each
+            request and Result.response is a list of the transport format of each request's Result.
+        """
+        batch = self._batch
+        if not batch:
+            return Result(0, [])
+        self._batch = []
+
+        requests = []
+        futures = []
+        for action, fields, future in batch:
+            request = dict(fields)
+            request['action'] = action
+            requests.append(request)
+            futures.append(future)
+
+        result = self._send({'action': 'batch', 'requests': requests})
+        if isinstance(result, Future):
+            result.add_done_callback(lambda f: _resolve_batch(futures, f.result()))
+        else:
+            _resolve_batch(futures, result)
+        return result
 
     def initialize(self):
         """
@@ -80,17 +417,16 @@ class BaseClient:
 
         Raises
         ------
-        Exception
-            If group_atts does not contain a name attribute
+        ValueError
+            If group_atts does not contain a name attribute, or the name is empty
         """
-        if 'name' not in group_atts:
-            raise Exception("group_atts must contain a key 'name'")
+        if not group_atts.get(_NAME):
+            raise ValueError("group_atts must contain a key 'name' with a non-empty value")
 
-        request = {'action': 'add_group',
-                   'group_atts': group_atts,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'group_atts': group_atts,
+                  'managers': managers
+                  }
+        return self._call_encoded(_ADD_GROUP, fields)
 
     def add_user(self, user_atts, managers="any") -> Result:
         """
@@ -113,17 +449,48 @@ class BaseClient:
 
         Raises
         ------
-        Exception
-            If user_atts does not contain a name attribute
+        ValueError
+            If user_atts does not contain a name attribute, or the name is empty
+        """
+        if not user_atts.get(_NAME):
+            raise ValueError("user_atts must contain a key 'name' with a non-empty value")
+
+        fields = {'user_atts': user_atts,
+                  'managers': managers
+                  }
+        return self._call_encoded(_ADD_USER, fields)
+
+    def add_users(self, user_atts_list, managers="any") -> Result:
+        """
+        Request that a list of users be created in a single request
+
+        Parameters
+        ----------
+        user_atts_list: list
+            A list of user_atts dictionaries (see add_user). Each must minimally contain a key 'name'
+        managers: object
+            Either the string "any" meaning all managers that implement the method will be called, or a list of
+            manager class names that should be called
+
+        Returns
+        -------
+        Result
+            Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
+            of the backend operations (MethodAPI)
+
+        Raises
+        ------
+        ValueError
+            If any element of user_atts_list does not contain a name attribute, or the name is empty
         """
-        if 'name' not in user_atts:
-            raise Exception("user_atts must contain a key 'name'")
+        for user_atts in user_atts_list:
+            if not user_atts.get(_NAME):
+                raise ValueError("each element of user_atts_list must contain a key 'name' with a non-empty value")
 
-        request = {'action': 'add_user',
-                   'user_atts': user_atts,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'user_atts_list': user_atts_list,
+                  'managers': managers
+                  }
+        return self._call_encoded(_ADD_USERS, fields)
 
     def associate_user_to_group(self, user_name, group_name, managers="any") -> Result:
         """
@@ -145,12 +512,34 @@ class BaseClient:
             Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
             of the backend operations (MethodAPI)
         """
-        request = {'action': 'associate_user_to_group',
-                   'user_name': user_name,
-                   'group_name': group_name,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'user_name': user_name,
+                  'group_name': group_name,
+                  'managers': managers
+                  }
+        return self._call_encoded(_ASSOCIATE_USER_TO_GROUP, fields)
+
+    def associate_users_to_groups(self, pairs, managers="any") -> Result:
+        """
+        Request that a list of users are added to groups in a single request
+
+        Parameters
+        ----------
+        pairs: list
+            A list of (user_name, group_name) pairs
+        managers: object
+            Either the string "any" meaning all managers that implement the method will be called, or a list of
+            manager class names that should be called
+
+        Returns
+        -------
+        Result
+            Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
+            of the backend operations (MethodAPI)
+        """
+        fields = {'pairs': [[user_name, group_name] for user_name, group_name in pairs],
+                  'managers': managers
+                  }
+        return self._call_encoded(_ASSOCIATE_USERS_TO_GROUPS, fields)
 
     def delete_group(self, name, managers="any") -> Result:
         """
@@ -170,11 +559,10 @@ class BaseClient:
             Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
             of the backend operations (MethodAPI)
         """
-        request = {'action': 'delete_group',
-                   'name': name,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'name': name,
+                  'managers': managers
+                  }
+        return self._call_encoded(_DELETE_GROUP, fields)
 
     def delete_user(self, name, managers="any") -> Result:
         """
@@ -194,11 +582,33 @@ class BaseClient:
             Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
             of the backend operations (MethodAPI)
         """
-        request = {'action': 'delete_user',
-                   'name': name,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'name': name,
+                  'managers': managers
+                  }
+        return self._call_encoded(_DELETE_USER, fields)
+
+    def delete_users(self, names, managers="any") -> Result:
+        """
+        Request to delete a list of users in a single request
+
+        Parameters
+        ----------
+        names: list
+            User names
+        managers: object
+            Either the string "any" meaning all managers that implement the method will be called, or a list of
+            manager class names that should be called
+
+        Returns
+        -------
+        Result
+            Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
+            of the backend operations (MethodAPI)
+        """
+        fields = {'names': names,
+                  'managers': managers
+                  }
+        return self._call_encoded(_DELETE_USERS, fields)
 
     def disassociate_user_from_group(self, user_name, group_name, managers="any") -> Result:
         """
@@ -220,16 +630,16 @@ class BaseClient:
             Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
             of the backend operations (MethodAPI)
         """
-        request = {'action': 'disassociate_user_from_group',
-                   'user_name': user_name,
-                   'group_name': group_name,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'user_name': user_name,
+                  'group_name': group_name,
+                  'managers': managers
+                  }
+        return self._call_encoded(_DISASSOCIATE_USER_FROM_GROUP, fields)
 
     def disassociate_users_from_group(self, user_names, group_name, managers="any") -> Result:
         """
-        Request to remove a list of users from a group
+        Request to remove a list of users from a group. Lists longer than 5000 names are sent as several requests,
+        whose Results are combined as described by _call_chunked.
 
         Parameters
         ----------
@@ -247,12 +657,11 @@ class BaseClient:
             Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
             of the backend operations (MethodAPI)
         """
-        request = {'action': 'disassociate_users_from_group',
-                   'user_names': user_names,
-                   'group_name': group_name,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'user_names': user_names,
+                  'group_name': group_name,
+                  'managers': managers
+                  }
+        return self._call_chunked(_DISASSOCIATE_USERS_FROM_GROUP, fields, 'user_names')
 
     def set_user_default_group(self, user_name, group_name, managers="any") -> Result:
         """
@@ -273,12 +682,11 @@ class BaseClient:
             Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
             of the backend operations (MethodAPI)
         """
-        request = {'action': 'set_user_default_group',
-                   'user_name': user_name,
-                   'group_name': group_name,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'user_name': user_name,
+                  'group_name': group_name,
+                  'managers': managers
+                  }
+        return self._call_encoded(_SET_USER_DEFAULT_GROUP, fields)
 
     def update_group(self, group_atts, managers="any") -> Result:
         """
@@ -297,11 +705,10 @@ class BaseClient:
             Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
             of the backend operations (MethodAPI)
         """
-        request = {'action': 'update_group',
-                   'group_atts': group_atts,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'group_atts': group_atts,
+                  'managers': managers
+                  }
+        return self._call_encoded(_UPDATE_GROUP, fields)
 
     def update_user(self, user_atts, managers="any") -> Result:
         """
@@ -320,8 +727,7 @@ class BaseClient:
             Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
             of the backend operations (MethodAPI)
         """
-        request = {'action': 'update_user',
-                   'user_atts': user_atts,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'user_atts': user_atts,
+                  'managers': managers
+                  }
+        return self._call_encoded(_UPDATE_USER, fields)
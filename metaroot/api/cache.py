@@ -0,0 +1,89 @@
+import threading
+import time
+from metaroot.api.result import Result
+
+
+class TTLCache:
+    """
+    A cache of lookup Results keyed by the user or group name they describe. Successful (positive) and unsuccessful
+    (negative) Results expire after separate lifetimes, so that a name that does not exist yet is probed again soon.
+    Results with transport error statuses (>= 450) are never cached.
+    """
+
+    def __init__(self, pos_ttl: float = 60, neg_ttl: float = 10):
+        """
+        Parameters
+        ----------
+        pos_ttl: float
+            Seconds that a successful Result is reused
+        neg_ttl: float
+            Seconds that an unsuccessful Result is reused
+        """
+        self._pos_ttl = pos_ttl
+        self._neg_ttl = neg_ttl
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, key: tuple) -> Result:
+        """
+        Looks up a cached Result
+
+        Parameters
+        ----------
+        name: str
+            The user or group name the Result describes
+        key: tuple
+            Identifies the lookup (e.g., the action and managers)
+
+        Returns
+        -------
+        Result
+            The cached Result, or None if there is no unexpired entry
+        """
+        with self._lock:
+            entry = self._entries.get(name, {}).get(key)
+            if entry is None:
+                return None
+            if entry[0] < time.monotonic():
+                del self._entries[name][key]
+                return None
+            return entry[1]
+
+    def put(self, name: str, key: tuple, result: Result):
+        """
+        Caches a Result
+
+        Parameters
+        ----------
+        name: str
+            The user or group name the Result describes
+        key: tuple
+            Identifies the lookup (e.g., the action and managers)
+        result: Result
+            The Result of the lookup
+        """
+        if result.status >= 450:
+            return
+        ttl = self._pos_ttl if result.is_success() else self._neg_ttl
+        with self._lock:
+            self._entries.setdefault(name, {})[key] = (time.monotonic() + ttl, result)
+
+    def invalidate(self, names):
+        """
+        Discards every cached Result for the given names
+
+        Parameters
+        ----------
+        names: iterable
+            User and/or group names
+        """
+        with self._lock:
+            for name in names:
+                self._entries.pop(name, None)
+
+    def clear(self):
+        """
+        Discards every cached Result
+        """
+        with self._lock:
+            self._entries.clear()
@@ -1,6 +1,9 @@
+from concurrent.futures import Future
 from metaroot.api.base_client import BaseClient
+from metaroot.api.result import Result
 from metaroot.config import get_config
 from metaroot.event.producer import Producer
+from metaroot.wire import ENCODING_ERRORS, encode_with_prefix
 
 
 class EventClientAPI(BaseClient):
@@ -11,5 +14,51 @@ class EventClientAPI(BaseClient):
     requires a short time from call to return. This style precludes use of methods that fetch/get information from
     the backend.
     """
-    def __init__(self):
+
+    __slots__ = ('_pipelined',)
+
+    def __init__(self, pipelined: bool = False, confirmed: bool = True):
+        """
+        Parameters
+        ----------
+        pipelined: bool
+            If True, methods return immediately with a Future that resolves to the delivery Result, allowing many
+            messages to be in flight at once. Call flush() to wait for all outstanding messages.
+        confirmed: bool
+            If False, methods do not wait for the message queue server to confirm delivery, and return a Result with
+            response "queued" as soon as the message is written to the connection. Messages can then be lost without
+            notice if the server fails. Unconfirmed sends do not wait, so pipelined is ignored.
+        """
         super().__init__(Producer(get_config(self.__class__.__name__)))
+        self._pipelined = pipelined and confirmed
+        if not confirmed:
+            self._send = self.client.send_nowait
+            self._send_encoded = self.client.send_encoded_nowait
+        elif pipelined:
+            self._send = self.client.send_async
+            self._send_encoded = self.client.send_encoded_async
+
+    def _call_encoded(self, prefix: str, fields: dict) -> Result:
+        """
+        Encodes and sends the request, returning a Future instead of a Result if the client is pipelined
+        """
+        if self._pipelined and self._batch is None:
+            try:
+                message = encode_with_prefix(prefix, fields)
+            except ENCODING_ERRORS:
+                future = Future()
+                future.set_result(Result(453, "Could not serialize the message"))
+                return future
+            return self._send_encoded(message)
+        return super()._call_encoded(prefix, fields)
+
+    def flush(self) -> Result:
+        """
+        Wait for all messages sent by a pipelined client to be delivered
+
+        Returns
+        -------
+        Result
+            Result.status is 0 if every message was delivered, >0 otherwise
+        """
+        return self.client.flush()
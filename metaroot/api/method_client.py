@@ -1,7 +1,59 @@
-from metaroot.api.base_client import BaseClient
+import functools
+import threading
+import yaml
+from concurrent.futures import Future
+from metaroot.api.base_client import BaseClient, _DISASSOCIATE_USERS_FROM_GROUP
+from metaroot.api.cache import TTLCache
 from metaroot.api.result import Result
-from metaroot.config import get_config
-from metaroot.rpc.client import RPCClient
+from metaroot.api.pool import get_pool
+
+# The constant part of each request is encoded once, so that only the arguments are encoded on each call
+_EXISTS_GROUP = yaml.safe_dump({'action': 'exists_group'})
+_EXISTS_USER = yaml.safe_dump({'action': 'exists_user'})
+_GET_GROUP = yaml.safe_dump({'action': 'get_group'})
+_GET_MEMBERS = yaml.safe_dump({'action': 'get_members'})
+_GET_USER = yaml.safe_dump({'action': 'get_user'})
+_GET_GROUP_IF_EXISTS = yaml.safe_dump({'action': 'get_group_if_exists'})
+_GET_USER_IF_EXISTS = yaml.safe_dump({'action': 'get_user_if_exists'})
+_LIST_USERS = yaml.safe_dump({'action': 'list_users'})
+_VALIDATE_USERS = yaml.safe_dump({'action': 'validate_users'})
+_ROLES_USER = yaml.safe_dump({'action': 'roles_user'})
+_LIST_GROUPS = yaml.safe_dump({'action': 'list_groups'})
+
+# Lookups of a single user or group whose Results may be cached
+_CACHEABLE = frozenset({_EXISTS_GROUP, _EXISTS_USER, _GET_GROUP, _GET_MEMBERS, _GET_USER, _GET_GROUP_IF_EXISTS,
+                        _GET_USER_IF_EXISTS})
+
+# Requests that do not modify users or groups. All other requests invalidate cached Results for the names they touch.
+_READS = _CACHEABLE | {_LIST_USERS, _VALIDATE_USERS, _ROLES_USER, _LIST_GROUPS}
+
+
+def _names_in(fields: dict):
+    """
+    Yields every user and group name referenced by the arguments of a request
+
+    Parameters
+    ----------
+    fields: dict
+        The arguments of a request
+
+    Yields
+    -------
+    str
+        A user or group name
+    """
+    for key in ('name', 'user_name', 'group_name'):
+        if key in fields:
+            yield fields[key]
+    for key in ('names', 'user_names'):
+        yield from fields.get(key, ())
+    for key in ('group_atts', 'user_atts'):
+        if key in fields:
+            yield fields[key].get('name')
+    for atts in fields.get('user_atts_list', ()):
+        yield atts.get('name')
+    for pair in fields.get('pairs', ()):
+        yield from pair
 
 
 class MethodClientAPI(BaseClient):
@@ -11,8 +63,121 @@ class MethodClientAPI(BaseClient):
     information from the backend are available (versus the EventClient)
     """
 
-    def __init__(self):
-        super().__init__(RPCClient(get_config(self.__class__.__name__)))
+    __slots__ = ('_cache', '_coalesce_window_s', '_coalesce_queue', '_coalesce_lock')
+
+    def __init__(self, oneway: bool = False, enable_cache: bool = False, cache_ttl: float = 60,
+                 negative_cache_ttl: float = 10, enable_coalesce: bool = False, coalesce_window_s: float = 0.005):
+        """
+        Initialize the API to send requests through the process wide pool of RPC clients for its configuration. With
+        statements and initialize()/finalize() do not open or close connections, which are reused by all instances.
+
+        Parameters
+        ----------
+        oneway: bool
+            If True, requests that return no payload (delete_*, associate_*, disassociate_* and set_user_default_group)
+            are sent without waiting for a reply. Their Result then reflects delivery of the request only, not the
+            outcome of the backend operations. Can be changed for some requests with call_kind().
+        enable_cache: bool
+            If True, the Results of exists_*, get_group, get_members and get_user are reused for repeated lookups of
+            the same name. Requests made through this client that modify a user or group discard its cached Results,
+            but changes made by other clients are only seen once cached Results expire.
+        cache_ttl: float
+            Seconds that a successful lookup is reused
+        negative_cache_ttl: float
+            Seconds that an unsuccessful lookup (e.g., the user does not exist) is reused
+        enable_coalesce: bool
+            If True, disassociate_user_from_group returns a Future, and calls for the same group and managers made
+            within coalesce_window_s of each other are sent as one disassociate_users_from_group request. Each Future
+            resolves to the Result of that combined request.
+        coalesce_window_s: float
+            Seconds that a disassociate_user_from_group call waits for others to coalesce with
+        """
+        super().__init__(get_pool(self.__class__.__name__))
+        self._oneway = oneway
+        self._oneway_default = oneway
+        self._cache = TTLCache(cache_ttl, negative_cache_ttl) if enable_cache else None
+
+        # (group_name, managers, oneway) -> ([user names], [Futures]) waiting to be sent as one request
+        self._coalesce_window_s = coalesce_window_s if enable_coalesce else None
+        self._coalesce_queue = {}
+        self._coalesce_lock = threading.Lock()
+
+    def disassociate_user_from_group(self, user_name, group_name, managers="any") -> Result:
+        """
+        Request to remove a user from a group. If coalescing is enabled, returns a Future that resolves to the Result
+        of the disassociate_users_from_group request the call was combined into.
+
+        See Also
+        ---------
+        BaseClient#disassociate_user_from_group
+        """
+        if self._coalesce_window_s is None or self._batch is not None:
+            return super().disassociate_user_from_group(user_name, group_name, managers)
+
+        # The call_kind() in effect now decides how the combined request is sent, since the timer thread sends it later.
+        # Calls made inside batch() were sent above, so no batch is in effect.
+        key = (group_name, managers if isinstance(managers, str) else tuple(managers), self._oneway)
+        future = Future()
+        with self._coalesce_lock:
+            pending = self._coalesce_queue.get(key)
+            if pending is None:
+                pending = ([], [])
+                self._coalesce_queue[key] = pending
+                threading.Timer(self._coalesce_window_s, self._send_coalesced, (key, managers)).start()
+            pending[0].append(user_name)
+            pending[1].append(future)
+        return future
+
+    def _send_coalesced(self, key: tuple, managers: object):
+        """
+        Sends the disassociate_user_from_group calls collected for a group as one request, and resolves their Futures.
+        Runs on a timer thread, so the request is sent with the call kind recorded in key rather than the batch() or
+        call_kind() currently active on the client.
+
+        Parameters
+        ----------
+        key: tuple
+            The group name, hashable form of managers and oneway setting that identify the collected calls
+        managers: object
+            The managers argument of the collected calls
+        """
+        with self._coalesce_lock:
+            user_names, futures = self._coalesce_queue.pop(key)
+        try:
+            fields = {'user_names': user_names,
+                      'group_name': key[0],
+                      'managers': managers
+                      }
+            if self._cache is not None:
+                self._cache.invalidate(_names_in(fields))
+            result = self._call_chunked(_DISASSOCIATE_USERS_FROM_GROUP, fields, 'user_names',
+                                        functools.partial(self._send_request, oneway=key[2]))
+        except Exception as e:
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future in futures:
+            future.set_result(result)
+
+    def _call_encoded(self, prefix: str, fields: dict) -> Result:
+        """
+        Answers lookups from the cache when it is enabled, and invalidates cached Results touched by other requests
+        """
+        if self._cache is None:
+            return super()._call_encoded(prefix, fields)
+
+        if prefix in _CACHEABLE and self._batch is None:
+            managers = fields['managers']
+            key = (prefix, managers if isinstance(managers, str) else tuple(managers))
+            result = self._cache.get(fields['name'], key)
+            if result is None:
+                result = super()._call_encoded(prefix, fields)
+                self._cache.put(fields['name'], key, result)
+            return result
+
+        if prefix not in _READS:
+            self._cache.invalidate(_names_in(fields))
+        return super()._call_encoded(prefix, fields)
 
     def exists_group(self, name, managers="any") -> Result:
         """
@@ -32,11 +197,10 @@ class MethodClientAPI(BaseClient):
             Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
             of the backend operations (MethodAPI)
         """
-        request = {'action': 'exists_group',
-                   'name': name,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'name': name,
+                  'managers': managers
+                  }
+        return self._call_encoded(_EXISTS_GROUP, fields)
 
     def exists_user(self, name, managers="any") -> Result:
         """
@@ -56,11 +220,10 @@ class MethodClientAPI(BaseClient):
             Depending on the underlying client this will be the status of message delivery (EventAPI) or the status
             of the backend operations (MethodAPI)
         """
-        request = {'action': 'exists_user',
-                   'name': name,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'name': name,
+                  'managers': managers
+                  }
+        return self._call_encoded(_EXISTS_USER, fields)
 
     def get_group(self, name, managers="any") -> Result:
         """
@@ -79,11 +242,33 @@ class MethodClientAPI(BaseClient):
         Result
             The group data
         """
-        request = {'action': 'get_group',
-                   'name': name,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'name': name,
+                  'managers': managers
+                  }
+        return self._call_encoded(_GET_GROUP, fields)
+
+    def get_group_if_exists(self, name, managers="any") -> Result:
+        """
+        Retrieve all information about a group from the backend if the group exists, in a single round trip. Requires
+        a server that implements get_group_if_exists (e.g., the Router).
+
+        Parameters
+        ----------
+        name: str
+            Group name
+        managers: object
+            Either the string "any" meaning all managers that implement the method will be called, or a list of
+            manager class names that should be called
+
+        Returns
+        -------
+        Result
+            The group data if the group exists. Result.status is 404 if the group does not exist.
+        """
+        fields = {'name': name,
+                  'managers': managers
+                  }
+        return self._call_encoded(_GET_GROUP_IF_EXISTS, fields)
 
     def get_members(self, name, managers="any") -> Result:
         """
@@ -102,11 +287,10 @@ class MethodClientAPI(BaseClient):
         Result
             The list of user names associate with the group
         """
-        request = {'action': 'get_members',
-                   'name': name,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'name': name,
+                  'managers': managers
+                  }
+        return self._call_encoded(_GET_MEMBERS, fields)
 
     def get_user(self, name, managers="any") -> Result:
         """
@@ -125,11 +309,33 @@ class MethodClientAPI(BaseClient):
         Result
             The user data
         """
-        request = {'action': 'get_user',
-                   'name': name,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'name': name,
+                  'managers': managers
+                  }
+        return self._call_encoded(_GET_USER, fields)
+
+    def get_user_if_exists(self, name, managers="any") -> Result:
+        """
+        Retrieve all information about the user from the backend if the user exists, in a single round trip. Requires
+        a server that implements get_user_if_exists (e.g., the Router).
+
+        Parameters
+        ----------
+        name: str
+            User name
+        managers: object
+            Either the string "any" meaning all managers that implement the method will be called, or a list of
+            manager class names that should be called
+
+        Returns
+        -------
+        Result
+            The user data if the user exists. Result.status is 404 if the user does not exist.
+        """
+        fields = {'name': name,
+                  'managers': managers
+                  }
+        return self._call_encoded(_GET_USER_IF_EXISTS, fields)
 
     def list_users(self, with_default_group="any", managers="any") -> Result:
         """
@@ -149,17 +355,17 @@ class MethodClientAPI(BaseClient):
         Result
             Lists of user names generated by all backend managers that implement the method
         """
-        request = {'action': 'list_users',
-                   'with_default_group': with_default_group,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'with_default_group': with_default_group,
+                  'managers': managers
+                  }
+        return self._call_encoded(_LIST_USERS, fields)
 
     def validate_users(self, names: list, managers="any"):
         """
         Removes user names from the argument list that are invalid, returning the list containing only valid
         user names. If this method is implemented, it usually means that validation requires lookup in a backend
-        database.
+        database. Lists longer than 5000 names are sent as several requests, whose Results are combined as described
+        by BaseClient#_call_chunked.
 
         Parameters
         ----------
@@ -175,11 +381,10 @@ class MethodClientAPI(BaseClient):
             Result.status is 0 for success, > 0 on error.
             Result.response is the list of names that were valid
         """
-        request = {'action': 'validate_users',
-                   'names': names,
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'names': names,
+                  'managers': managers
+                  }
+        return self._call_chunked(_VALIDATE_USERS, fields, 'names')
 
     def roles_user(self, name: str, managers="any"):
         """
@@ -200,10 +405,10 @@ class MethodClientAPI(BaseClient):
             Result.status is 0 for success, > 0 on error.
             Result.response is the list of names that were valid
         """
-        request = {'action': 'roles_user',
-                   'name': name,
-                   'managers': managers}
-        return self._call(request)
+        fields = {'name': name,
+                  'managers': managers
+                  }
+        return self._call_encoded(_ROLES_USER, fields)
 
     def list_groups(self, managers="any") -> Result:
         """
@@ -220,7 +425,6 @@ class MethodClientAPI(BaseClient):
         Result
             Lists of group names generated by all backend managers that implement the method
         """
-        request = {'action': 'list_groups',
-                   'managers': managers
-                   }
-        return self._call(request)
+        fields = {'managers': managers
+                  }
+        return self._call_encoded(_LIST_GROUPS, fields)
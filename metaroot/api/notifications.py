@@ -1,14 +1,47 @@
-import email.message
+import atexit
+import concurrent.futures
+import email.header
+import functools
 import smtplib
 import re
+import ssl
+import threading
+import time
 from metaroot.config import get_config, get_global_config
 from metaroot.utils import get_logger, instantiate_object_from_class_path
 
-global_config = get_global_config()
-logger = get_logger(__name__,
-                    global_config.get_log_file(),
-                    global_config.get_file_verbosity(),
-                    global_config.get_screen_verbosity())
+
+@functools.lru_cache(maxsize=1)
+def _logger():
+    """
+    Creates the module logger on first use, so that importing the module does not configure logging
+    """
+    global_config = get_global_config()
+    return get_logger(__name__,
+                      global_config.get_log_file(),
+                      global_config.get_file_verbosity(),
+                      global_config.get_screen_verbosity())
+
+
+# Regex from https://stackoverflow.com/a/8022584/3357118
+_EMAIL_RE = re.compile(r"[^@]+@[^@]+\.[^@]+")
+
+# Connections idle for longer than this many seconds are assumed to have been dropped by the server
+_SMTP_MAX_IDLE_S = 30
+
+# Connections are replaced after sending this many messages, since some servers limit messages per session
+_SMTP_MAX_MESSAGES = 10000
+
+# Each thread reuses its own SMTP connection across calls to send_email
+_smtp_local = threading.local()
+
+# Every open connection, so that close() can reach connections owned by other threads
+_smtp_open = []
+_smtp_lock = threading.Lock()
+
+# Default number of threads that send email in the background, and of messages that may wait for one of them
+_SMTP_WORKERS = 4
+_SMTP_MAX_QUEUED = 1000
 
 
 class DefaultEmailAddressResolver:
@@ -17,18 +50,246 @@ class DefaultEmailAddressResolver:
     expression. If 'x' is one or more chars that does not contain @, the regex tests for strings that match x@x.x
     """
     @staticmethod
+    @functools.lru_cache(maxsize=4096)
     def resolve_to_email_address(user_name: str) -> str:
-        # The user name looks like it is already an email address (e.g., ?@?.?)
-        # Regex from https://stackoverflow.com/a/8022584/3357118
-        if re.fullmatch(r"[^@]+@[^@]+\.[^@]+", user_name):
+        # The user name looks like it is already an email address (e.g., ?@?.?). Valid addresses are cached, since the
+        # same recipients recur; invalid ones raise and are not cached.
+        if _EMAIL_RE.fullmatch(user_name):
             return user_name
         else:
             raise Exception("The user name {0} does not appear ot be an email address, and no resolver is configured".format(user_name))
 
 
-def send_email(recipient_user_name: str, subject: str, body: str):
+_DEFAULT_RESOLVER = DefaultEmailAddressResolver()
+
+
+@functools.lru_cache(maxsize=8)
+def _get_resolver(class_path: str) -> object:
+    """
+    Returns the email address resolver for a class path, instantiating it on first use. Resolvers are expected to be
+    stateless, so a single instance is shared by all messages.
+
+    Parameters
+    ----------
+    class_path: str
+        The SMTP_ADDRESS_RESOLVER configuration value
+
+    Returns
+    -------
+    object
+        An instance of the resolver class
+    """
+    return instantiate_object_from_class_path(class_path)
+
+
+def _format_message(sender: str, recipient: str, subject: str, body: str) -> bytes:
+    """
+    Formats an HTML email for smtplib, without the overhead of building and generating an email.message.Message
+
+    Parameters
+    ----------
+    sender: str
+        Address of the sender
+    recipient: str
+        Address of the recipient
+    subject: str
+        Subject of the email, which is RFC 2047 encoded if it is not ASCII
+    body: str
+        HTML body of the email
+
+    Returns
+    -------
+    bytes
+        The message, with CRLF line endings and a UTF-8 body
+
+    Raises
+    ---------
+    ValueError
+        if a header value contains a line break, which would allow headers to be injected
+    """
+    for value in (sender, recipient, subject):
+        if "\r" in value or "\n" in value:
+            raise ValueError("Email header values must not contain line breaks")
+    try:
+        subject.encode("ascii")
+    except UnicodeEncodeError:
+        subject = email.header.Header(subject, "utf-8").encode()
+
+    body = body.replace("\r\n", "\n").replace("\n", "\r\n")
+    return ("Subject: {0}\r\n"
+            "From: {1}\r\n"
+            "To: {2}\r\n"
+            "MIME-Version: 1.0\r\n"
+            "Content-Type: text/html; charset=utf-8\r\n"
+            "\r\n"
+            "{3}").format(subject, sender, recipient, body).encode("utf-8")
+
+
+def _connect_smtp(config) -> smtplib.SMTP:
+    """
+    Opens a connection to the SMTP server, starting TLS and authenticating if configured
+
+    Parameters
+    ----------
+    config: Config
+        The NOTIFICATIONS configuration
+
+    Returns
+    -------
+    smtplib.SMTP
+        The connection
+    """
+    # Evaluate TLS configuration and connect with implicit TLS (e.g., port 465) or start TLS is requested
+    if config.get("SMTP_USE_SSL", False):
+        s = smtplib.SMTP_SSL(config.get("SMTP_SERVER"), context=ssl.create_default_context())
+    elif config.get("SMTP_START_TLS", False):
+        s = smtplib.SMTP(config.get("SMTP_SERVER"))
+        s.starttls()
+    else:
+        s = smtplib.SMTP(config.get("SMTP_SERVER"))
+        _logger().warning("The values of SMTP_USE_SSL and SMTP_START_TLS are missing or did not evaluate to True, so "
+                          "not using TLS")
+
+    # If a username and password were specified, authenticte to the SMPT server
+    user = config.get("SMTP_USER", None)
+    password = config.get("SMTP_PASSWORD", None)
+    if user is not None and password is not None:
+        _logger().debug("Authenticating to the SMTP server")
+        s.login(user, password)
+    else:
+        _logger().debug("Not authenticating to the SMTP server")
+    return s
+
+
+def _get_smtp(config) -> smtplib.SMTP:
+    """
+    Returns the calling thread's SMTP connection, opening a new one if there is none, it has been idle too long, or it
+    has sent _SMTP_MAX_MESSAGES messages
+
+    Parameters
+    ----------
+    config: Config
+        The NOTIFICATIONS configuration
+
+    Returns
+    -------
+    smtplib.SMTP
+        A connection that was open when last used
+    """
+    s = getattr(_smtp_local, "smtp", None)
+    if s is not None and (time.monotonic() - _smtp_local.last_used > _SMTP_MAX_IDLE_S or
+                          _smtp_local.sent >= _SMTP_MAX_MESSAGES):
+        _discard_smtp()
+        s = None
+
+    if s is None:
+        s = _connect_smtp(config)
+        _smtp_local.smtp = s
+        _smtp_local.last_used = time.monotonic()
+        _smtp_local.sent = 0
+        with _smtp_lock:
+            _smtp_open.append(s)
+    return s
+
+
+def _quit_smtp(s: smtplib.SMTP):
+    """
+    Closes an SMTP connection, ignoring errors from connections the server has already dropped
+    """
+    try:
+        s.quit()
+    except Exception:
+        s.close()
+
+
+def _discard_smtp():
+    """
+    Closes the calling thread's SMTP connection, if any, so that the next message opens a new one
+    """
+    s = getattr(_smtp_local, "smtp", None)
+    _smtp_local.smtp = None
+    if s is not None:
+        with _smtp_lock:
+            if s in _smtp_open:
+                _smtp_open.remove(s)
+        _quit_smtp(s)
+
+
+@functools.lru_cache(maxsize=1)
+def _get_mail_pool() -> tuple:
+    """
+    Creates the thread pool that sends email in the background. The number of threads is read from SMTP_WORKERS in
+    the NOTIFICATIONS configuration, if present.
+
+    Returns
+    -------
+    tuple
+        The concurrent.futures.ThreadPoolExecutor, and a threading.BoundedSemaphore that limits the number of messages
+        submitted but not yet sent
+    """
+    workers = _SMTP_WORKERS
+    try:
+        config = get_config("NOTIFICATIONS")
+        workers = int(config.get("SMTP_WORKERS", workers))
+    except Exception:
+        pass
+    return (concurrent.futures.ThreadPoolExecutor(max_workers=workers),
+            threading.BoundedSemaphore(workers + _SMTP_MAX_QUEUED))
+
+
+def close():
+    """
+    Waits for queued email to be sent and closes all SMTP connections opened by send_email. Called automatically at
+    interpreter exit.
+    """
+    if _get_mail_pool.cache_info().currsize > 0:
+        _get_mail_pool()[0].shutdown(wait=True)
+        _get_mail_pool.cache_clear()
+
+    with _smtp_lock:
+        connections = list(_smtp_open)
+        _smtp_open.clear()
+    for s in connections:
+        _quit_smtp(s)
+
+
+atexit.register(close)
+
+
+def send_email(recipient_user_name: str, subject: str, body: str) -> concurrent.futures.Future:
+    """
+    Method to send an email notification with an HTML body in the background. The caller only waits if too many
+    messages are already waiting to be sent.
+
+    Parameters
+    ----------
+    recipient_user_name: str
+        The user name that should receive the notification. This is resolved to an email address using either the
+        builtin default resolver, or with a custom resolver specified in the SMTP configuration
+    subject: str
+        Subject of the email
+    body: str
+        Body of the email
+
+    Returns
+    -------
+    concurrent.futures.Future
+        Completes with True if the email was sent, or False if the email could not be sent
+    """
+    pool, slots = _get_mail_pool()
+    slots.acquire()
+    try:
+        future = pool.submit(send_email_sync, recipient_user_name, subject, body)
+    except Exception:
+        slots.release()
+        raise
+    future.add_done_callback(lambda f: slots.release())
+    return future
+
+
+def send_email_sync(recipient_user_name: str, subject: str, body: str) -> bool:
     """
-    Method to send an email notification with an HTML body
+    Method to send an email notification with an HTML body, waiting until it has been sent
 
     Parameters
     ----------
@@ -55,47 +316,36 @@ def send_email(recipient_user_name: str, subject: str, body: str):
         except Exception as e:
             config = None
 
-        if config is not None and config.has("SMTP_SERVER") and config.has("SMTP_FROM"):
+        sender = None
+        if config is not None and config.has("SMTP_SERVER"):
+            sender = config.get("SMTP_FROM", None)
+
+        if sender is not None:
             # Resolve/validate the recipient email adress
-            resolver = DefaultEmailAddressResolver()
-            if config.has("SMTP_ADDRESS_RESOLVER"):
-                resolver = instantiate_object_from_class_path(config.get("SMTP_ADDRESS_RESOLVER"))
-
-            # # # #
-            # The following is based heavily on https://stackoverflow.com/a/32129736/3357118
-            msg = email.message.Message()
-            msg['Subject'] = subject
-            msg['From'] = config.get("SMTP_FROM")
-            msg['To'] = resolver.resolve_to_email_address(recipient_user_name)
-            msg.add_header('Content-Type', 'text/html')
-            msg.set_payload(body)
-
-            s = smtplib.SMTP(config.get("SMTP_SERVER"))
-
-            # Evaluate TLS configuration and start TLS is requested
-            if config.has("SMTP_START_TLS") and config.get("SMTP_START_TLS"):
-                s.starttls()
-            else:
-                logger.warning("The value of SMTP_START_TLS is missing or did not evaluate to True, so not using TLS")
-
-            # If a username and password were specified, authenticte to the SMPT server
-            if config.has("SMTP_USER") and config.has("SMTP_PASSWORD"):
-                logger.debug("Authenticating to the SMTP server")
-                s.login(config.get("SMTP_USER"),
-                        config.get("SMTP_PASSWORD"))
-            else:
-                logger.debug("Not authenticating to the SMTP server")
-
-            s.sendmail(msg['From'], [msg['To']], msg.as_string())
-            s.quit()
-            # # # # # #
+            resolver = _DEFAULT_RESOLVER
+            resolver_class_path = config.get("SMTP_ADDRESS_RESOLVER", None)
+            if resolver_class_path is not None:
+                resolver = _get_resolver(resolver_class_path)
+
+            recipient = resolver.resolve_to_email_address(recipient_user_name)
+            msg = _format_message(sender, recipient, subject, body)
+
+            try:
+                _get_smtp(config).sendmail(sender, [recipient], msg)
+            except (smtplib.SMTPServerDisconnected, ConnectionError):
+                # The server closed a reused connection, so retry once on a new connection
+                _logger().debug("SMTP connection was lost, reconnecting")
+                _discard_smtp()
+                _get_smtp(config).sendmail(sender, [recipient], msg)
+            _smtp_local.last_used = time.monotonic()
+            _smtp_local.sent = _smtp_local.sent + 1
 
             return True
         else:
-            logger.warning("SMTP settings are missing on incomplete. Message \"%s\" to %s could not be sent",
-                           subject, recipient_user_name)
+            _logger().warning("SMTP settings are missing on incomplete. Message \"%s\" to %s could not be sent",
+                              subject, recipient_user_name)
             return False
     except Exception as e:
-        logger.exception(e)
-        logger.error("Message \"%s\" to \"%s\" could not be sent", subject, recipient_user_name)
+        _logger().exception(e)
+        _logger().error("Message \"%s\" to \"%s\" could not be sent", subject, recipient_user_name)
         return False
@@ -0,0 +1,280 @@
+import functools
+import pika.exceptions
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from metaroot.api.result import Result
+from metaroot.config import Config, get_config
+from metaroot.rpc.client import RPCClient
+
+# Heartbeat interval RPCClient requests from the server, in seconds
+_HEARTBEAT_S = 30
+
+# A client that has been idle for this many seconds services pending heartbeat and close frames before it is lent out,
+# so that a connection the server dropped while it was idle is discarded rather than used
+_IDLE_S = _HEARTBEAT_S / 2
+
+
+class RPCClientPool:
+    """
+    A pool of connected RPC clients shared by every API object in a process. The pool has the same send, send_encoded,
+    connect and close methods as an RPCClient, so it can be used as the client of a BaseClient. Each request borrows a
+    client for its duration, so concurrent callers do not wait on a single channel, and connections are reused rather
+    than opened and closed for each use of an API object.
+    """
+
+    def __init__(self, size: int, config: Config):
+        """
+        Initialize a new pool. Clients are connected when first needed.
+
+        Parameters
+        ----------
+        size: int
+            The maximum number of clients (and connections) in the pool
+        config: Config
+            Connection properties for the RPC server
+        """
+        self._config = config
+        self._size = size
+        self._created = 0
+        self._lock = threading.Lock()
+
+        # Most recently returned clients are reused first, so that idle connections are the ones left to time out.
+        # Entries are (client, time returned) tuples.
+        self._idle = queue.LifoQueue()
+
+    def _checkout(self):
+        """
+        Takes an idle client, connects a new one if the pool is not full, or waits for a client to be returned
+
+        Returns
+        -------
+        RPCClient
+            A connected client, or None if a new connection could not be established
+        """
+        while True:
+            try:
+                client = self._take_idle(self._idle.get_nowait())
+                if client is not None:
+                    return client
+                continue
+            except queue.Empty:
+                pass
+
+            with self._lock:
+                create = self._created < self._size
+                if create:
+                    self._created = self._created + 1
+            if create:
+                client = RPCClient(self._config)
+                if client.connect():
+                    return client
+                with self._lock:
+                    self._created = self._created - 1
+                return None
+
+            # Wake periodically, in case a broken client was discarded rather than returned
+            try:
+                client = self._take_idle(self._idle.get(timeout=1))
+                if client is not None:
+                    return client
+            except queue.Empty:
+                pass
+
+    def _take_idle(self, entry: tuple):
+        """
+        Checks that a client taken from the idle queue is still connected, polling the connection if it has been idle
+        long enough for the server to have dropped it. A client that is no longer connected is discarded.
+
+        Parameters
+        ----------
+        entry: tuple
+            A (client, time returned) tuple from the idle queue
+
+        Returns
+        -------
+        RPCClient
+            The client, or None if it was discarded
+        """
+        client, returned = entry
+        if time.monotonic() - returned > _IDLE_S:
+            try:
+                client.connection.process_data_events(time_limit=0)
+            except pika.exceptions.AMQPError:
+                pass
+        if self._is_usable(client):
+            return client
+        self._discard(client)
+        return None
+
+    @staticmethod
+    def _is_usable(client: RPCClient) -> bool:
+        """
+        Checks that both the connection and the channel of a client are open
+
+        Parameters
+        ----------
+        client: RPCClient
+            A client obtained from _checkout
+
+        Returns
+        -------
+        bool
+            True if the client can be used to send requests
+        """
+        return client.connection is not None and client.connection.is_open and \
+            client.channel is not None and client.channel.is_open
+
+    def _discard(self, client: RPCClient):
+        """
+        Closes a client and frees its place in the pool
+
+        Parameters
+        ----------
+        client: RPCClient
+            A client obtained from _checkout
+        """
+        client.close()
+        with self._lock:
+            self._created = self._created - 1
+
+    def _checkin(self, client: RPCClient):
+        """
+        Returns a client to the pool, discarding it if its connection or channel has been closed
+
+        Parameters
+        ----------
+        client: RPCClient
+            A client obtained from _checkout
+        """
+        if self._is_usable(client):
+            self._idle.put((client, time.monotonic()))
+        else:
+            self._discard(client)
+
+    @contextmanager
+    def acquire(self):
+        """
+        Borrows a client from the pool for the duration of a with block
+
+        Yields
+        -------
+        RPCClient
+            A connected client, or None if a new connection could not be established
+        """
+        client = self._checkout()
+        try:
+            yield client
+        finally:
+            if client is not None:
+                self._checkin(client)
+
+    def send(self, obj: object) -> Result:
+        """
+        Sends an RPC request using a client borrowed from the pool
+
+        Parameters
+        ----------
+        obj: object
+            A dictionary specifying a remote method name and arguments to invoke
+
+        Returns
+        ----------
+        Result
+            Result.status is 0 for success, >0 on error
+            Result.response is any object returned by the remote method invocation or None
+        """
+        with self.acquire() as client:
+            if client is None:
+                return Result(470, "Message could not be delivered")
+            return client.send(obj)
+
+    def send_encoded(self, message: str) -> Result:
+        """
+        Sends an RPC request that has already been encoded in the wire format using a client borrowed from the pool
+
+        Parameters
+        ----------
+        message: str
+            An encoded dictionary specifying a remote method name and arguments to invoke
+
+        Returns
+        ----------
+        Result
+            Result.status is 0 for success, >0 on error
+            Result.response is any object returned by the remote method invocation or None
+        """
+        with self.acquire() as client:
+            if client is None:
+                return Result(470, "Message could not be delivered")
+            return client.send_encoded(message)
+
+    def send_encoded_oneway(self, message: str) -> Result:
+        """
+        Sends an RPC request that has already been encoded in the wire format without waiting for a response, using a
+        client borrowed from the pool
+
+        Parameters
+        ----------
+        message: str
+            An encoded dictionary specifying a remote method name and arguments to invoke
+
+        Returns
+        ----------
+        Result
+            Result.status is 0 if the request was sent, >0 on error
+            Result.response is None
+        """
+        with self.acquire() as client:
+            if client is None:
+                return Result(470, "Message could not be delivered")
+            return client.send_encoded_oneway(message)
+
+    def connect(self) -> bool:
+        """
+        Stub to match RPCClient. Clients are connected when they are first needed.
+
+        Returns
+        ----------
+        bool
+            Always returns True
+        """
+        return True
+
+    def close(self):
+        """
+        Stub to match RPCClient. Connections are shared by every user of the pool, so they are not closed when one
+        user is done with them. See shutdown().
+        """
+        pass
+
+    def shutdown(self):
+        """
+        Closes the connections of all idle clients in the pool
+        """
+        while True:
+            try:
+                client, returned = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(client)
+
+
+@functools.lru_cache(maxsize=None)
+def get_pool(key: str) -> RPCClientPool:
+    """
+    Returns the process wide pool of RPC clients for a configuration key, creating it on first use
+
+    Parameters
+    ----------
+    key: str
+        The key that identifies the configuration information of the RPC server
+
+    Returns
+    -------
+    RPCClientPool
+        The same pool for every call with the same key
+    """
+    config = get_config(key)
+    return RPCClientPool(config.get_rpc_pool_size(), config)
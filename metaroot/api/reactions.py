@@ -1,9 +1,49 @@
+import functools
+import html
+import json
 from metaroot.api.result import Result
 from metaroot.api.notifications import send_email
 from metaroot.config import get_config
 
 
-config = get_config("DEFAULTREACTIONS")
+@functools.lru_cache(maxsize=1)
+def _config():
+    """
+    Looks up the DEFAULTREACTIONS configuration on first use, rather than when the module is imported
+    """
+    return get_config("DEFAULTREACTIONS")
+
+
+# Formats the body of the notification email; the bound format method of the template is looked up only once
+_format_body = ("<table>"
+                "<tr><td>Class</td><td>{0}</td></tr>"
+                "<tr><td>Action</td><td>{1}</td></tr>"
+                "<tr><td>Payload</td><td>{2}</td></tr>"
+                "<tr><td>Result Status</td><td>{3}</td></tr>"
+                "<tr><td>Result Payload</td><td>{4}</td></tr>"
+                "</table>").format
+
+
+def _to_html(value: object) -> str:
+    """
+    Renders a value for a cell of the notification email
+
+    Parameters
+    ----------
+    value: object
+        A string, number, or any other object that can be represented as JSON
+
+    Returns
+    -------
+    str
+        The value (strings and numbers) or its JSON representation (everything else), HTML escaped
+    """
+    if not isinstance(value, (str, int, float)):
+        try:
+            value = json.dumps(value, default=str)
+        except (TypeError, ValueError):
+            value = str(value)
+    return html.escape(str(value))
 
 
 class DefaultReactions:
@@ -32,16 +72,12 @@ class DefaultReactions:
             value is set to 0 as the router begins calling methods of each manager implementing the current request
             action, and it increases by one each time a Result from a manager operation triggers a reaction.
         """
-        global config
-
         if result.is_error():
-            send_email(config.get("REACTION_NOTIFY"),
+            send_email(_config().get("REACTION_NOTIFY"),
                        "metaroot operation failed",
-                       "<table>" +
-                       "<tr><td>Class</td><td>"+clazz+"</td></tr>"
-                       "<tr><td>Action</td><td>"+action+"</td></tr>" +
-                       "<tr><td>Payload</td><td>"+str(payload)+"</td></tr>" +
-                       "<tr><td>Result Status</td><td>"+str(result.status)+"</td></tr>" +
-                       "<tr><td>Result Payload</td><td>"+str(result.response)+"</td></tr>" +
-                       "</table>")
+                       _format_body(_to_html(clazz),
+                                    _to_html(action),
+                                    _to_html(payload),
+                                    result.status,
+                                    _to_html(result.response)))
         return 0
@@ -3,6 +3,8 @@ class Result:
     A standard result wrapper to ensure uniformity of return types at the top level.
     """
 
+    __slots__ = ('status', 'response')
+
     def __init__(self, status: int, response: object):
         """
         Initialize a new Result
@@ -1,8 +1,18 @@
+import functools
 import yaml
 import os
+import pathlib
+import sys
 from enum import Enum
+from types import MappingProxyType
 from metaroot.utils import get_logger
 
+# libyaml's loader is much faster than the pure Python one, and produces the same result for safe YAML
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
 
 class ConfigParams(Enum):
     """
@@ -24,7 +34,36 @@ class ConfigParams(Enum):
     SSL = 'SSL'
     SSL_VERIFY_MODE = 'SSL_VERIFY_MODE'
     SSL_NOCHECK_HOSTNAME = 'SSL_NOCHECK_HOSTNAME'
-
+    RPC_POOL_SIZE = 'RPC_POOL_SIZE'
+    PREFETCH_COUNT = 'PREFETCH_COUNT'
+
+
+# The ConfigParams values as plain strings, so that getters do not resolve an Enum member and its value on each call
+_MQUSER = ConfigParams.MQUSER.value
+_MQPASS = ConfigParams.MQPASS.value
+_MQHOST = ConfigParams.MQHOST.value
+_MQPORT = ConfigParams.MQPORT.value
+_MQNAME = ConfigParams.MQNAME.value
+_MQHDLR = ConfigParams.MQHDLR.value
+_SCREEN_VERBOSITY = ConfigParams.SCREEN_VERBOSITY.value
+_FILE_VERBOSITY = ConfigParams.FILE_VERBOSITY.value
+_LOG_FILE = ConfigParams.LOG_FILE.value
+_HOOKS = ConfigParams.HOOKS.value
+_ACTIVITY_STREAM_CLASS = ConfigParams.ACTIVITY_STREAM_CLASS.value
+_ACTIVITY_STREAM_DATABASE = ConfigParams.ACTIVITY_STREAM_DATABASE.value
+_READ_ONLY_ENABLED = ConfigParams.READ_ONLY_ENABLED.value
+_SSL = ConfigParams.SSL.value
+_SSL_VERIFY_MODE = ConfigParams.SSL_VERIFY_MODE.value
+_SSL_NOCHECK_HOSTNAME = ConfigParams.SSL_NOCHECK_HOSTNAME.value
+_RPC_POOL_SIZE = ConfigParams.RPC_POOL_SIZE.value
+_PREFETCH_COUNT = ConfigParams.PREFETCH_COUNT.value
+
+
+# Configuration file names searched for in the working directory and its parents, in order of precedence
+_CONFIG_FILE_NAMES = ("metaroot-test.yaml", "metaroot.yaml")
+
+# Default for Config.get that distinguishes "no default given" from a default of None
+_MISSING = object()
 
 config_logger = None
 
@@ -34,73 +73,92 @@ class Config:
     A standardized source of configuration information that maps a dict of key=value pairs to getters
     """
 
+    __slots__ = ('_data',)
+
     def __init__(self):
         self._data = dict()
-        self._data[ConfigParams.LOG_FILE.value] = "metaroot.log"
-        self._data[ConfigParams.SCREEN_VERBOSITY.value] = "INFO"
-        self._data[ConfigParams.FILE_VERBOSITY.value] = "INFO"
-        self._data[ConfigParams.ACTIVITY_STREAM_CLASS.value] = "$NONE"
-
-    def get(self, key):
-        return self._data[key]
+        self._data[_LOG_FILE] = "metaroot.log"
+        self._data[_SCREEN_VERBOSITY] = "INFO"
+        self._data[_FILE_VERBOSITY] = "INFO"
+        self._data[_ACTIVITY_STREAM_CLASS] = "$NONE"
+        self._data[_RPC_POOL_SIZE] = 4
+        self._data[_PREFETCH_COUNT] = 1
+
+    def get(self, key, default=_MISSING):
+        if default is _MISSING:
+            return self._data[key]
+        return self._data.get(key, default)
 
     def has(self, key):
         return key in self._data
 
     def populate(self, atts: dict):
-        for prop in atts:
-            self._data[prop] = atts[prop]
+        # Keys loaded from YAML are interned, so that lookups with the constant keys used in code match by identity
+        for prop, value in atts.items():
+            self._data[sys.intern(prop) if isinstance(prop, str) else prop] = value
 
     def data(self):
         return self._data
 
+    def freeze(self):
+        """
+        Makes the configuration read-only, so that a single instance can safely be shared by all callers
+        """
+        self._data = MappingProxyType(self._data)
+
     def get_mq_user(self):
-        return self._data[ConfigParams.MQUSER.value]
+        return self._data[_MQUSER]
 
     def get_mq_pass(self):
-        return self._data[ConfigParams.MQPASS.value]
+        return self._data[_MQPASS]
 
     def get_mq_host(self):
-        return self._data[ConfigParams.MQHOST.value]
+        return self._data[_MQHOST]
 
     def get_mq_port(self):
-        return int(self._data[ConfigParams.MQPORT.value])
+        return int(self._data[_MQPORT])
 
     def get_mq_queue_name(self):
-        return self._data[ConfigParams.MQNAME.value]
+        return self._data[_MQNAME]
 
     def get_mq_handler_class(self):
-        return self._data[ConfigParams.MQHDLR.value]
+        return self._data[_MQHDLR]
 
     def get_screen_verbosity(self):
-        return self._data[ConfigParams.SCREEN_VERBOSITY.value]
+        return self._data[_SCREEN_VERBOSITY]
 
     def get_file_verbosity(self):
-        return self._data[ConfigParams.FILE_VERBOSITY.value]
+        return self._data[_FILE_VERBOSITY]
 
     def get_log_file(self):
-        return self._data[ConfigParams.LOG_FILE.value]
+        return self._data[_LOG_FILE]
 
     def get_hooks(self):
-        return self._data[ConfigParams.HOOKS.value]
+        return self._data[_HOOKS]
 
     def get_activity_stream(self):
-        return self._data[ConfigParams.ACTIVITY_STREAM_CLASS.value]
+        return self._data[_ACTIVITY_STREAM_CLASS]
 
     def get_activity_stream_db(self):
-        return self._data[ConfigParams.ACTIVITY_STREAM_DATABASE.value]
+        return self._data[_ACTIVITY_STREAM_DATABASE]
 
     def get_read_only_enabled(self):
-        return ConfigParams.READ_ONLY_ENABLED.value in self._data
+        return _READ_ONLY_ENABLED in self._data
 
     def get_ssl(self):
-        return ConfigParams.SSL.value in self._data
+        return _SSL in self._data
 
     def get_ssl_verify_mode(self):
-        return self._data[ConfigParams.SSL_VERIFY_MODE.value]
+        return self._data[_SSL_VERIFY_MODE]
 
     def get_ssl_nocheck_hostname(self):
-        return ConfigParams.SSL_NOCHECK_HOSTNAME.value in self._data
+        return _SSL_NOCHECK_HOSTNAME in self._data
+
+    def get_rpc_pool_size(self):
+        return int(self._data[_RPC_POOL_SIZE])
+
+    def get_prefetch_count(self):
+        return int(self._data[_PREFETCH_COUNT])
 
 
 def debug_config(config: Config):
@@ -111,7 +169,8 @@ def debug_config(config: Config):
 def get_config(key: str):
     """
     Returns environment specific information by searching a set of locations. The current implementation searches for
-    'key' in the top-level keys of the global 'auto' which is loaded from local file 'metaroot[-test].yaml'
+    'key' in the top-level keys of the file 'metaroot[-test].yaml', which is loaded the first time any configuration is
+    requested
 
     The returned configuration is created by augmenting/overwriting the parameters defined for key 'GLOBAL'
     with all parameters defined for 'key'.
@@ -128,19 +187,29 @@ def get_config(key: str):
     Returns
     ----------
     Config
-        The configuration if it is found
+        The configuration if it is found. The Config is read-only and shared by all callers requesting the same key.
 
     Raises
     ----------
     Exception
         If no configuration could be found, or the configuration information was invalid
     """
-    key = key.upper()
+    return _get_config(key.upper())
+
+
+@functools.lru_cache(maxsize=None)
+def _get_config(key: str):
+    """
+    Builds the configuration for an upper case key. Results are cached, so every call for the same key returns the
+    same read-only Config.
+    """
+    auto = _get_auto()
     config = Config()
 
     try:
         config.populate(auto["GLOBAL"])
         config.populate(auto[key])
+        config.freeze()
         config_logger.info("%s using auto-configuration from global", key)
         return config
     except Exception:
@@ -148,6 +217,42 @@ def get_config(key: str):
         raise Exception("Could not locate configuration in any standard locations")
 
 
+def _load_metaroot_section(stream) -> dict:
+    """
+    Parses a configuration file, building Python objects only for the METAROOT section. The other top-level sections
+    of the file are parsed into YAML nodes but never constructed.
+
+    Parameters
+    ----------
+    stream
+        An open configuration file
+
+    Returns
+    ----------
+    dict
+        The METAROOT section of the file
+
+    Raises
+    ----------
+    KeyError
+        If the file does not define a METAROOT section
+    """
+    loader = _SafeLoader(stream)
+    try:
+        root = loader.get_single_node()
+        section = None
+        if isinstance(root, yaml.MappingNode):
+            # As with a full load, a repeated key takes the last value
+            for key_node, value_node in root.value:
+                if isinstance(key_node, yaml.ScalarNode) and key_node.value == "METAROOT":
+                    section = value_node
+        if section is None:
+            raise KeyError("METAROOT")
+        return loader.construct_object(section, deep=True)
+    finally:
+        loader.dispose()
+
+
 def load_file_based_config():
     """
     Locates environment specific information by searching for file 'metaroot[-test].yaml' starting in the current
@@ -163,26 +268,22 @@ def load_file_based_config():
     ----------
         Exception if an IO or parsing error occurs while loading the config file, or if no config file could not be found
     """
-    path = ""
     envfile = os.getenv('METAROOT_CONFIG_FILE')
     config_file = None
-    attempts = 0
     global config_logger
 
     # Precedence of test file discovery is 1) environment variable specified, 2) metaroot-test.yaml, 3) metaroot.yaml
-    while attempts < 4:
-        if envfile is not None and os.path.exists(envfile):
-            config_file = envfile
-            break
-        elif os.path.exists(path+"metaroot-test.yaml"):
-            config_file = path+"metaroot-test.yaml"
-            break
-        elif os.path.exists(path+"metaroot.yaml"):
-            config_file = path+"metaroot.yaml"
-            break
-        elif os.path.exists(path + "../"):
-            path = path + "../"
-            attempts = attempts + 1
+    if envfile is not None and os.path.exists(envfile):
+        config_file = envfile
+    else:
+        here = pathlib.Path.cwd()
+        for base in [here] + list(here.parents)[:3]:
+            for name in _CONFIG_FILE_NAMES:
+                if (base / name).exists():
+                    config_file = str(base / name)
+                    break
+            if config_file is not None:
+                break
 
     # If no configuration file could be located
     if config_file is None:
@@ -191,13 +292,11 @@ def load_file_based_config():
     # Load config, raises exception on error
     # print("Loading configuration file {0}".format(config_file))
     try:
-        stream = open(config_file, 'r')
-        config = yaml.safe_load(stream)
-        stream.close()
-        config = config["METAROOT"]
+        with open(config_file, 'r') as stream:
+            config = _load_metaroot_section(stream)
 
     except Exception as e:
-        print("An IO or parsing error was encountered while loading the config file {0}".format(path+config_file))
+        print("An IO or parsing error was encountered while loading the config file {0}".format(config_file))
         raise e
 
     # If we found a configuration file, we want to output logging statements in the requested way, so configure a
@@ -215,13 +314,16 @@ def load_file_based_config():
               'METAROOT_MQPASS': 'MQPASS',
               'METAROOT_MQHOST': 'MQHOST',
               'METAROOT_MQPORT': 'MQPORT'}
-    for key in params:
-        if os.getenv(key) is not None:
-            config['GLOBAL'][params[key]] = os.getenv(key)
+    env = os.environ
+    for env_key, config_key in params.items():
+        value = env.get(env_key)
+        if value is not None:
+            config['GLOBAL'][config_key] = value
 
     return config
 
 
+@functools.lru_cache(maxsize=None)
 def get_global_config():
     """
     Retrieves only the global parameters.
@@ -229,7 +331,7 @@ def get_global_config():
     Returns
     ----------
     Config
-        The global configuration as a Config object
+        The global configuration as a read-only Config object shared by all callers
 
     Raises
     ----------
@@ -237,8 +339,42 @@ def get_global_config():
         If no configuration could be found, or the configuration information was invalid
     """
     config = Config()
-    config.populate(auto["GLOBAL"])
+    config.populate(_get_auto()["GLOBAL"])
+    config.freeze()
     return config
 
 
-auto = load_file_based_config()
+@functools.lru_cache(maxsize=None)
+def _get_auto():
+    """
+    Loads the configuration file the first time it is needed rather than when the module is imported, so that
+    importing metaroot modules does not search for, read and parse it
+
+    Returns
+    ----------
+    dict
+        The METAROOT section of the configuration file
+
+    Raises
+    ----------
+    Exception
+        If no configuration file could be found, or an IO or parsing error occurred while loading it. The next call
+        tries again.
+    """
+    return load_file_based_config()
+
+
+def reload_config():
+    """
+    Reloads the configuration file and discards the cached results of get_config and get_global_config, so that later
+    calls see changes to the file or to environment variables. Objects that already hold a Config keep using it.
+
+    Raises
+    ----------
+    Exception
+        If no configuration file could be found, or an IO or parsing error occurred while loading it
+    """
+    _get_auto.cache_clear()
+    _get_config.cache_clear()
+    get_global_config.cache_clear()
+    _get_auto()
@@ -1,11 +1,22 @@
 import pika.exceptions
-import yaml
 import sys
-import inspect
+import logging
 import signal
 import time
 import metaroot.config
 import metaroot.utils
+from metaroot.api.actions import action_name
+from metaroot.wire import CLOSE_IMMEDIATELY, DECODING_ERRORS, decode, is_close_immediately
+
+
+# Long-lived consumer connections use a longer heartbeat, so that a slow handler does not cause a false disconnect,
+# and TCP keepalive, so that a dead peer is noticed without waiting for a heartbeat to time out
+_HEARTBEAT_S = 60
+_BLOCKED_TIMEOUT_S = 300
+_TCP_OPTIONS = {'TCP_KEEPIDLE': 60, 'TCP_KEEPINTVL': 30, 'TCP_KEEPCNT': 5}
+
+# Seconds that acknowledgements of handled messages may be held back, when they are acknowledged in batches
+_ACK_DELAY_S = 0.05
 
 
 class Consumer:
@@ -22,6 +33,18 @@ class Consumer:
         self._config = None
         self._exit_requested = False
 
+        # The object that methods were last called on, and its dispatch table
+        self._dispatch = (None, {})
+
+        # Built from the configuration by the first call to connect()
+        self._connection_parameters = None
+        self._queue_name = None
+        self._prefetch_count = 1
+
+        # Handled messages not yet acknowledged, and the delivery tag of the last of them
+        self._unacked = 0
+        self._last_delivery_tag = None
+
     def __enter__(self):
         """
         Stub for contexts. Not setup required.
@@ -60,21 +83,28 @@ class Consumer:
             self._logger.error("The message does not define an 'action' -> %s", message)
             return self.get_error_response(450)
 
-        # Lookup the requested method in the manager object
-        try:
-            method = getattr(obj, message['action'])
-        except AttributeError:
-            self._logger.error("The method %q is not defined on the argument object %s",
+        # A batch message carries a list of requests that are each dispatched as if they had arrived separately
+        if message['action'] == 'batch':
+            return self.call_batch(obj, message)
+
+        # Lookup the requested method in the manager object's dispatch table, which is built the first time a method of
+        # the object is called. Actions may be method names or integer Action codes.
+        if self._dispatch[0] is not obj:
+            self._dispatch = (obj, metaroot.utils.build_dispatch_table(obj))
+        action = action_name(message['action'])
+        entry = metaroot.utils.lookup_dispatch_entry(obj, self._dispatch[1], action)
+        if entry is None:
+            self._logger.error("The method %s is not defined on the argument object %s",
                                message['action'], type(obj).__name__)
             return self.get_error_response(451)
 
         # Validate arguments match the method signature
-        arguments = inspect.signature(method).parameters
+        method, arguments, signature = entry
         args = []
         for argument in arguments:
             if argument not in message:
                 self._logger.error("Call to method %s.%s%s, no parameter %r in message", type(obj).__name__,
-                                   message['action'], inspect.signature(method), argument)
+                                   message['action'], signature, argument)
                 return self.get_error_response(452)
             args.append(message[argument])
 
@@ -86,6 +116,40 @@ class Consumer:
             self._logger.exception(e)
             return self.get_error_response(455)
 
+    def call_batch(self, obj: object, message: dict):
+        """
+        Calls a method of an object for each request in a batch message
+
+        Parameters
+        ----------
+        obj: object
+            An object to invoke methods of
+        message: dict
+            A message whose key 'requests' is a list of messages as accepted by call_method
+
+        Returns
+        ----------
+        dict
+            key status is the sum of the status of each request
+            key response is a list of the result of each request, in the order the requests appear in the batch
+        """
+        if not isinstance(message.get('requests'), list):
+            self._logger.error("The batch message does not define a list of 'requests' -> %s", message)
+            return self.get_error_response(452)
+
+        status = 0
+        responses = []
+        for request in message['requests']:
+            # Batches may not be nested
+            if isinstance(request, dict) and request.get('action') != 'batch':
+                result = self.call_method(obj, request)
+            else:
+                self._logger.error("The batch contains an invalid request -> %s", request)
+                result = self.get_error_response(450)
+            status = status + result["status"]
+            responses.append(result)
+        return {"status": status, "response": responses}
+
     def consume_callback(self, ch, method, props, body):
         """
         Method called when a response is received to a previous request
@@ -97,26 +161,33 @@ class Consumer:
         method:
             Unused
         props:
-            Unused
+            Properties of the message, including its content type
         body: bytearray
             Response to request
         """
         # If debugging, helpful to print each message consumed
-        self._logger.debug('Consumed message')
-        self._logger.debug("Body: %r", body.decode())
-
-        # Parse message body to object, setting result to fail if the body cannot be decoded as YAML
-        try:
-            message = yaml.safe_load(body)
-        except yaml.YAMLError as exc:
-            self._logger.error("YAML parsing error: %s", exc)
-            self._logger.error(body.decode())
-            ch.basic_ack(delivery_tag=method.delivery_tag)
-            return
+        # The level is checked first so that the body is only decoded when it will be logged
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug('Consumed message')
+            self._logger.debug("Body: %r", body.decode())
+
+        # Parse message body to object (as JSON if the content type says so, otherwise YAML), setting result to fail if
+        # the body cannot be decoded. CLOSE_IMMEDIATELY is recognized without parsing.
+        if is_close_immediately(body):
+            message = CLOSE_IMMEDIATELY
+        else:
+            try:
+                message = decode(body, props.content_type)
+            except DECODING_ERRORS as exc:
+                self._logger.error("Message parsing error: %s", exc)
+                self._logger.error(body.decode())
+                self._ack(ch, method.delivery_tag)
+                return
 
         # Handle special case of the CLOSE_IMMEDIATELY message that shuts down the Consumer
-        if message == "CLOSE_IMMEDIATELY":
-            ch.basic_ack(delivery_tag=method.delivery_tag)
+        if message == CLOSE_IMMEDIATELY:
+            self._ack(ch, method.delivery_tag)
+            self._flush_acks()
             self._exit_requested = True
             self._channel.stop_consuming()
             return
@@ -125,50 +196,115 @@ class Consumer:
         self.call_method(self._handler, message)
 
         # Acknowledge message consumed
-        ch.basic_ack(delivery_tag=method.delivery_tag)
+        self._ack(ch, method.delivery_tag)
+
+    def _ack(self, ch, delivery_tag: int):
+        """
+        Acknowledges a handled message. If PREFETCH_COUNT allows more than one unacknowledged message, acknowledgements
+        are held back and sent for several messages at once, when half of the prefetch window has been handled or
+        after _ACK_DELAY_S seconds, whichever is first.
+
+        Parameters
+        ----------
+        ch:
+            Channel the message was received on
+        delivery_tag: int
+            Delivery tag of the message
+        """
+        if self._prefetch_count <= 1:
+            ch.basic_ack(delivery_tag=delivery_tag)
+            return
+
+        self._last_delivery_tag = delivery_tag
+        self._unacked += 1
+        if self._unacked >= self._prefetch_count // 2:
+            self._flush_acks()
+        elif self._unacked == 1:
+            self._connection.call_later(_ACK_DELAY_S, self._flush_acks)
+
+    def _flush_acks(self):
+        """
+        Acknowledges all handled messages that have not been acknowledged yet with a single frame
+        """
+        if self._unacked > 0:
+            self._unacked = 0
+            self._channel.basic_ack(delivery_tag=self._last_delivery_tag, multiple=True)
 
     def shutdown(self):
         self._logger.info("Shutting down...")
 
-        try:
-            self._handler.initialize()
-        except Exception as e:
-            self._logger.info("channel.stop_consuming() raised an exception")
-            self._logger.exception(e)
+        # Stop the reconnect loop in start() from trying again
+        self._exit_requested = True
 
         try:
-            self._channel.stop_consuming()
+            self._handler.finalize()
         except Exception as e:
-            self._logger.info("channel.stop_consuming() raised an exception")
+            self._logger.info("handler.finalize() raised an exception")
             self._logger.exception(e)
 
-        try:
-            self._connection.close()
-        except Exception as e:
-            self._logger.info("connection.close() raised an exception")
-            self._logger.exception(e)
+        # The reconnect loop may have just replaced or closed the channel and connection, so only touch them if
+        # they are still open
+        channel = self._channel
+        if channel is not None and channel.is_open:
+            try:
+                self._flush_acks()
+                channel.stop_consuming()
+            except Exception as e:
+                self._logger.info("channel.stop_consuming() raised an exception")
+                self._logger.exception(e)
+
+        connection = self._connection
+        if connection is not None and connection.is_open:
+            try:
+                connection.close()
+            except Exception as e:
+                self._logger.info("connection.close() raised an exception")
+                self._logger.exception(e)
+
+    def _get_connection_parameters(self) -> pika.ConnectionParameters:
+        """
+        Builds the parameters for connecting to the message queue server from the configuration the first time they
+        are needed, so that reconnect attempts reuse them rather than reading the configuration again
+
+        Returns
+        -------
+        pika.ConnectionParameters
+            The parameters of every connection made by this consumer
+        """
+        if self._connection_parameters is None:
+            self._queue_name = self._config.get_mq_queue_name()
+            self._prefetch_count = self._config.get_prefetch_count()
 
-    def connect(self):
-        try:
             # Pretty standard connection stuff (user, password, etc)
             credentials = pika.PlainCredentials(self._config.get_mq_user(), self._config.get_mq_pass())
-            parameters = pika.ConnectionParameters(host=self._config.get_mq_host(),
-                                                   port=self._config.get_mq_port(),
-                                                   virtual_host='/',
-                                                   credentials=credentials,
-                                                   heartbeat=30)
-            self._connection = pika.BlockingConnection(parameters)
+            self._connection_parameters = pika.ConnectionParameters(host=self._config.get_mq_host(),
+                                                                    port=self._config.get_mq_port(),
+                                                                    virtual_host='/',
+                                                                    credentials=credentials,
+                                                                    heartbeat=_HEARTBEAT_S,
+                                                                    blocked_connection_timeout=_BLOCKED_TIMEOUT_S,
+                                                                    tcp_options=_TCP_OPTIONS)
+        return self._connection_parameters
+
+    def connect(self):
+        try:
+            self._connection = pika.BlockingConnection(self._get_connection_parameters())
             self._channel = self._connection.channel()
 
+            # Delivery tags start again on a new channel. Messages that were not acknowledged on the old one are
+            # delivered again by the server.
+            self._unacked = 0
+
             # Only servers declare queues (not the clients)
-            self._channel.queue_declare(self._config.get_mq_queue_name(),
+            self._channel.queue_declare(self._queue_name,
                                         durable=True)  # request that the queue be persisted to disk
 
-            # Only receive messages if idle
-            self._channel.basic_qos(prefetch_count=1)
+            # By default only receive messages if idle. A larger PREFETCH_COUNT lets the broker send the next messages
+            # while one is being handled, saving a round trip per message; they are still handled one at a time in order
+            self._channel.basic_qos(prefetch_count=self._prefetch_count)
 
             # Attach the callback to handle messages
-            self._channel.basic_consume(queue=self._config.get_mq_queue_name(),
+            self._channel.basic_consume(queue=self._queue_name,
                                         on_message_callback=self.consume_callback)
 
             return True
@@ -206,11 +342,16 @@ class Consumer:
         # Instantiate an instance of the class specified in the config file that will process messages
         self._handler = metaroot.utils.instantiate_object_from_class_path(self._config.get_mq_handler_class())
         self._handler.initialize()
+        self._dispatch = (self._handler, metaroot.utils.build_dispatch_table(self._handler))
         self._logger.info("instantiated handler %s", self._config.get_mq_handler_class())
 
         # We want to exit gracefully if a SIGTERM is sent, so configure a handler
         # signal.signal(signal.SIGTERM, self.shutdown)
 
+        # Read once here rather than on every reconnect
+        host = self._config.get_mq_host()
+        port = self._config.get_mq_port()
+
         # Consume messages, attempting to recover from network dropout
         self._logger.info('starting consume loop for messages of type "%s"...', self._config.get_mq_queue_name())
         connect_attempts = 1
@@ -222,10 +363,7 @@ class Consumer:
                 time.sleep(connect_attempts * 5)
                 connect_attempts = connect_attempts + 1
             else:
-                self._logger.info("Connected to message host %s:%d after %d attempts",
-                                  self._config.get_mq_host(),
-                                  self._config.get_mq_port(),
-                                  connect_attempts)
+                self._logger.info("Connected to message host %s:%d after %d attempts", host, port, connect_attempts)
                 connect_attempts = 1
 
                 try:
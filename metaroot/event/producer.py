@@ -1,16 +1,26 @@
 #!/usr/bin/env python
+import logging
 import pika
 import pika.exceptions
-import yaml
 import time
+from concurrent.futures import Future, ThreadPoolExecutor, wait
 from metaroot.api.result import Result
 from metaroot.config import Config
-from metaroot.utils import get_logger
+from metaroot.utils import get_logger, retry_delay
+from metaroot.wire import ENCODING_ERRORS, content_type, encode
+
+# Heartbeat interval requested from the server, in seconds
+_HEARTBEAT_S = 60
+
+# A producer that has not published for this many seconds services pending heartbeat and close frames before its next
+# publish, so that a connection the server dropped while it was idle is reopened up front
+_IDLE_S = _HEARTBEAT_S / 2
 
 
 class Producer:
     """
-    An AMQP message producer based on pika that sends messages with a YAML payload to the message queue server.
+    An AMQP message producer based on pika that sends messages with a YAML (or JSON, see metaroot.wire) payload to the
+    message queue server.
     """
 
     def __init__(self, config: Config):
@@ -30,8 +40,15 @@ class Producer:
         # Pretty standard connection stuff
         self.connection = None
         self.channel = None
+        self.unconfirmed_channel = None
         self.config = config
         self.queue = config.get_mq_queue_name()
+
+        # Every message is published with the same properties. The message should be persisted on disk.
+        self._properties = pika.BasicProperties(delivery_mode=2, content_type=content_type())
+        self._executor = None
+        self._pending = set()
+        self._last_publish = 0.0
         self._logger = get_logger(Producer.__name__,
                                   config.get_log_file(),
                                   config.get_file_verbosity(),
@@ -77,7 +94,7 @@ class Producer:
                                                port=self.config.get_mq_port(),
                                                virtual_host='/',
                                                credentials=credentials,
-                                               heartbeat=30)
+                                               heartbeat=_HEARTBEAT_S)
         self.connection = pika.BlockingConnection(parameters)
         self.connection.add_on_connection_blocked_callback(self._connection_blocked_cb)
         self.connection.add_on_connection_unblocked_callback(self._connection_unblocked_cb)
@@ -86,10 +103,19 @@ class Producer:
         # Turn on delivery confirmation
         self.channel.confirm_delivery()
 
+        # Messages sent with send_nowait() are published on a second channel that does not wait for confirmations
+        self.unconfirmed_channel = self.connection.channel()
+        self._last_publish = time.monotonic()
+
     def close(self):
         """
-        Close pika connection
+        Wait for any asynchronous sends to complete and close pika connection
         """
+        self.flush()
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
         try:
             if not self.connection.is_closed:
                 self.connection.close()
@@ -112,33 +138,121 @@ class Producer:
             Result.status is 0 for success, >0 on error
             Result.response is None on success, and informational message on error
         """
-        # Encode the request dict as YAML
+        # Encode the request dict in the wire format
+        try:
+            message = encode(obj)
+        except ENCODING_ERRORS as exc:
+            self._logger.error("Serialization error: %s", exc)
+            self._logger.error("{0}".format(obj))
+            return Result(453, "Could not serialize the message")
+
+        return self.send_encoded(message)
+
+    def send_encoded(self, message: str) -> Result:
+        """
+        Publish a message that has already been encoded in the wire format to server
+
+        Parameters
+        ----------
+        message: str
+            The encoded message to send
+
+        Returns
+        ----------
+        Result
+            Result.status is 0 for success, >0 on error
+            Result.response is None on success, and informational message on error
+        """
+        return self._publish(message, True)
+
+    def send_nowait(self, obj: object) -> Result:
+        """
+        Publish a message to server without waiting for the server to confirm delivery. The message is persistent,
+        but it can be lost without notice if the server fails before storing it.
+
+        Parameters
+        ----------
+        obj: dict
+            The message to send
+
+        Returns
+        ----------
+        Result
+            Result.status is 0 if the message was handed to the connection, >0 on error
+            Result.response is "queued" on success, and informational message on error
+        """
         try:
-            message = yaml.safe_dump(obj)
-        except yaml.YAMLError as exc:
-            self._logger.error("YAML serialization error: %s", exc)
+            message = encode(obj)
+        except ENCODING_ERRORS as exc:
+            self._logger.error("Serialization error: %s", exc)
             self._logger.error("{0}".format(obj))
-            return Result(453, "Could not serialize the message as YAML")
+            return Result(453, "Could not serialize the message")
+
+        return self._publish(message, False)
+
+    def send_encoded_nowait(self, message: str) -> Result:
+        """
+        Publish a message that has already been encoded in the wire format to server without waiting for the server to
+        confirm delivery
+
+        Parameters
+        ----------
+        message: str
+            The encoded message to send
+
+        Returns
+        ----------
+        Result
+            Result.status is 0 if the message was handed to the connection, >0 on error
+            Result.response is "queued" on success, and informational message on error
+        """
+        return self._publish(message, False)
+
+    def _publish(self, message: str, confirmed: bool) -> Result:
+        """
+        Publish a message, reconnecting and retrying if the connection was lost
+
+        Parameters
+        ----------
+        message: str
+            The encoded message to send
+        confirmed: bool
+            If True, publish on the confirming channel and wait for the server to confirm delivery. Otherwise publish
+            on the unconfirmed channel and return as soon as the message is written to the connection.
 
+        Returns
+        ----------
+        Result
+            Result.status is 0 for success, >0 on error
+            Result.response is None (confirmed) or "queued" (unconfirmed) on success, and informational message on
+            error
+        """
         # Send RPC request to server
-        self._logger.debug("Sending %s:%s", self.queue, message.rstrip())
+        # The level is checked first so that the message is only copied by rstrip() when it will be logged
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug("Sending %s:%s", self.queue, message.rstrip())
 
         # Send message to server
         not_sent = True
         attempts = 1
-        while not_sent and attempts < 10:
+        while not_sent and attempts < 20:
             try:
-                self.channel.basic_publish(exchange='',
-                                           routing_key=self.queue,
-                                           body=message,
-                                           properties=pika.BasicProperties(
-                                               delivery_mode=2,
-                                               # Indicates message should be persisted on disk
-                                           ),
-                                           mandatory=True)
+                if time.monotonic() - self._last_publish > _IDLE_S:
+                    self.connection.process_data_events(time_limit=0)
+                channel = self.channel if confirmed else self.unconfirmed_channel
+                channel.basic_publish(exchange='',
+                                      routing_key=self.queue,
+                                      body=message,
+                                      properties=self._properties,
+                                      mandatory=confirmed)
+                self._last_publish = time.monotonic()
                 not_sent = False
+            except pika.exceptions.AMQPChannelError as e:
+                # The server refused the message or closed the channel, which trying again will not fix
+                self._logger.error("Failed to send on attempt %d: %r", attempts, e)
+                break
             except Exception as e:
-                time.sleep((attempts - 1) * 5)
+                time.sleep(retry_delay(attempts))
                 if self.connection.is_closed:
                     self._logger.error("Failed to send on attempt %d because connection closed. Reconnecting...", attempts)
                     self.connect()
@@ -150,7 +264,80 @@ class Producer:
             return Result(470, "Message could not be delivered")
         else:
             self._logger.debug("Success")
-            return Result(0, None)
+            return Result(0, None if confirmed else "queued")
+
+    def _submit(self, fn, arg) -> Future:
+        """
+        Queues a send to run on the producer's publishing thread. A single thread is used so that messages are
+        published in the order they were submitted, and the pika connection is never used concurrently.
+
+        Parameters
+        ----------
+        fn: callable
+            Either send or send_encoded
+        arg: object
+            The argument to fn
+
+        Returns
+        ----------
+        Future
+            Resolves to the Result of fn
+        """
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=1)
+        future = self._executor.submit(fn, arg)
+        self._pending.add(future)
+        future.add_done_callback(self._pending.discard)
+        return future
+
+    def send_async(self, obj: object) -> Future:
+        """
+        Publish a message to server without waiting for delivery to be confirmed
+
+        Parameters
+        ----------
+        obj: dict
+            The message to send
+
+        Returns
+        ----------
+        Future
+            Resolves to the Result that send() would have returned
+        """
+        return self._submit(self.send, obj)
+
+    def send_encoded_async(self, message: str) -> Future:
+        """
+        Publish a message that has already been encoded in the wire format without waiting for delivery to be confirmed
+
+        Parameters
+        ----------
+        message: str
+            The encoded message to send
+
+        Returns
+        ----------
+        Future
+            Resolves to the Result that send_encoded() would have returned
+        """
+        return self._submit(self.send_encoded, message)
 
+    def flush(self) -> Result:
+        """
+        Wait for all asynchronous sends to complete
 
+        Returns
+        ----------
+        Result
+            Result.status is 0 if every message was delivered, >0 otherwise
+            Result.response is None on success, and informational message on error
+        """
+        done, _ = wait(list(self._pending))
+        failed = 0
+        for future in done:
+            if future.exception() is not None or future.result().is_error():
+                failed = failed + 1
 
+        if failed > 0:
+            return Result(470, "{0} of {1} messages could not be delivered".format(failed, len(done)))
+        return Result(0, None)
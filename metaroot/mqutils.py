@@ -1,6 +1,95 @@
+import atexit
+import contextlib
 import pika
+import pika.exceptions
 from metaroot.config import get_global_config
 
+# Connection and channel shared by the queue administration functions, so that each call does not pay for a TCP and
+# AMQP handshake. Opened by the first call and closed at interpreter exit.
+_connection = None
+_channel = None
+
+
+def _open_channel():
+    """
+    Returns the shared channel, opening a new connection and/or channel if there is none or it has been closed
+
+    Returns
+    ----------
+    pika.adapters.blocking_connection.BlockingChannel
+        An open channel to the message queue server
+
+    Raises
+    ----------
+    Exception
+        If the underlying operations raise an exception
+    """
+    global _connection, _channel
+
+    # Polling the connection services heartbeats and notices a connection that was dropped while it was idle
+    if _connection is not None and _connection.is_open:
+        try:
+            _connection.process_data_events(0)
+        except pika.exceptions.AMQPError:
+            _connection = None
+
+    if _connection is None or not _connection.is_open:
+        config = get_global_config()
+
+        # Pretty standard connection stuff (user, password, etc)
+        credentials = pika.PlainCredentials(config.get_mq_user(), config.get_mq_pass())
+        parameters = pika.ConnectionParameters(host=config.get_mq_host(),
+                                               port=config.get_mq_port(),
+                                               virtual_host='/',
+                                               credentials=credentials,
+                                               heartbeat=30)
+        _connection = pika.BlockingConnection(parameters)
+        _channel = None
+
+    # A failed operation (e.g., declaring an existing queue with different arguments) closes the channel but not the
+    # connection
+    if _channel is None or not _channel.is_open:
+        _channel = _connection.channel()
+    return _channel
+
+
+@contextlib.contextmanager
+def mq_channel():
+    """
+    Provides a channel to the message queue server for a with block. The channel and its connection stay open for
+    later calls.
+
+    Returns
+    ----------
+    pika.adapters.blocking_connection.BlockingChannel
+        An open channel to the message queue server
+
+    Raises
+    ----------
+    Exception
+        If the underlying operations raise an exception
+    """
+    yield _open_channel()
+
+
+def close():
+    """
+    Closes the connection shared by the queue administration functions, if it is open
+    """
+    global _connection, _channel
+    connection = _connection
+    _connection = None
+    _channel = None
+    if connection is not None and connection.is_open:
+        try:
+            connection.close()
+        except pika.exceptions.AMQPError:
+            # The connection was already lost
+            pass
+
+
+atexit.register(close)
+
 
 def delete_queue(queue_name: str):
     """
@@ -21,19 +110,31 @@ def delete_queue(queue_name: str):
     Exception
         If the underlying operations raise an exception
     """
-    config = get_global_config()
-
-    # Pretty standard connection stuff (user, password, etc)
-    credentials = pika.PlainCredentials(config.get_mq_user(), config.get_mq_pass())
-    parameters = pika.ConnectionParameters(host=config.get_mq_host(),
-                                           port=config.get_mq_port(),
-                                           virtual_host='/',
-                                           credentials=credentials,
-                                           heartbeat=30)
-    connection = pika.BlockingConnection(parameters)
-    channel = connection.channel()
-    channel.queue_delete(queue=queue_name)
-    connection.close()
+    return delete_queues([queue_name])
+
+
+def delete_queues(queue_names: list):
+    """
+    Deletes queues from the message queue server over a single channel
+
+    Parameters
+    ----------
+    queue_names: list
+        The names of the queues to delete
+
+    Returns
+    ----------
+    int
+        Returns 0 on success
+
+    Raises
+    ----------
+    Exception
+        If the underlying operations raise an exception
+    """
+    with mq_channel() as channel:
+        for queue_name in queue_names:
+            channel.queue_delete(queue=queue_name)
     return 0
 
 
@@ -44,7 +145,7 @@ def create_queue(queue_name: str):
     Parameters
     ----------
     queue_name: str
-        The name of the queue to delete
+        The name of the queue to create
 
     Returns
     ----------
@@ -56,18 +157,30 @@ def create_queue(queue_name: str):
     Exception
         If the underlying operations raise an exception
     """
-    config = get_global_config()
-
-    # Pretty standard connection stuff
-    credentials = pika.PlainCredentials(config.get_mq_user(), config.get_mq_pass())
-    parameters = pika.ConnectionParameters(host=config.get_mq_host(),
-                                           port=config.get_mq_port(),
-                                           virtual_host='/',
-                                           credentials=credentials,
-                                           heartbeat=30)
-    connection = pika.BlockingConnection(parameters)
-    channel = connection.channel()
-    channel.queue_declare(queue_name,
-                          durable=True)  # request that the queue be persisted to disk
-    connection.close()
-    return 0
\ No newline at end of file
+    return create_queues([queue_name])
+
+
+def create_queues(queue_names: list):
+    """
+    Creates durable queues on the message queue server over a single channel
+
+    Parameters
+    ----------
+    queue_names: list
+        The names of the queues to create
+
+    Returns
+    ----------
+    int
+        Returns 0 on success
+
+    Raises
+    ----------
+    Exception
+        If the underlying operations raise an exception
+    """
+    with mq_channel() as channel:
+        for queue_name in queue_names:
+            channel.queue_declare(queue_name,
+                                  durable=True)  # request that the queue be persisted to disk
+    return 0
@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor, wait
 from metaroot.config import get_config, debug_config
 from metaroot.utils import instantiate_object_from_class_path, get_logger
 from metaroot.api.result import Result
@@ -77,6 +78,17 @@ class Router:
         # Check for read-only operation to block write requests
         self._read_only = config.get_read_only_enabled()
 
+        # Method name -> the managers that implement it, filled in by _bound_methods
+        self._methods = {}
+
+        # If PARALLEL_HOOKS is defined, managers are called concurrently, each on a dedicated thread so that a
+        # manager's message queue connection is only ever used by one thread
+        self._hook_executors = None
+        if config.has("PARALLEL_HOOKS"):
+            self._logger.info("Calling managers in parallel")
+            self._hook_executors = {manager.__class__.__name__: ThreadPoolExecutor(max_workers=1)
+                                    for manager in self._managers}
+
     def __enter__(self):
         """
         Stub for instantiation in context manager. The router is meant to run in a consumer or RPC server so it needs
@@ -126,31 +138,119 @@ class Router:
                                               result)
                 return result
 
+        # Filter which mangers to target (by default all will be targeted)
+        targets = [(manager_name, method) for manager_name, method in self._bound_methods(method_name)
+                   if target_managers == "any" or manager_name in target_managers]
+
+        # When calling managers in parallel, start every call now and handle the results below in hook order. Each
+        # manager is only ever called from its own executor thread, even when it is the only target, and every call
+        # has finished before any result is handled, so no call is still running when this method returns or raises.
+        futures = None
+        if self._hook_executors is not None:
+            futures = [self._hook_executors[manager_name].submit(method, *args) for manager_name, method in targets]
+            wait(futures)
+
         n_priors = 0
-        for manager in self._managers:
-            # Filter which mangers to target (by default all will be targeted)
-            if target_managers == "any" or manager.__class__.__name__ in target_managers:
+        for i, (manager_name, method) in enumerate(targets):
+            result = method(*args) if futures is None else futures[i].result()
+            status = status + result.status
+            all_results[manager_name] = result.to_transport_format()
+            self.__activity_stream.record(method_name + ":" + manager_name,
+                                          args,
+                                          result)
 
-                # Find the method on the manager (skip if not defined)
+            # Allow reactions to occur in response to result of last action
+            n_priors = n_priors + self._reactions.occur_in_response_to(manager_name, method_name, args, result, n_priors)
+
+        return Result(status, all_results)
+
+    def _bound_methods(self, method_name: str) -> tuple:
+        """
+        Finds the managers that implement a method the first time it is requested, so that later calls do not look up
+        the method and class name of every manager again
+
+        Parameters
+        ----------
+        method_name: str
+            The name of a Manager method
+
+        Returns
+        -------
+        tuple
+            A (manager class name, bound method) pair for each manager that defines the method, in hook order
+        """
+        bound = self._methods.get(method_name)
+        if bound is None:
+            bound = []
+            for manager in self._managers:
                 try:
-                    method = getattr(manager, method_name)
-                except AttributeError as e:
+                    bound.append((manager.__class__.__name__, getattr(manager, method_name)))
+                except AttributeError:
                     self._logger.debug("Method %s is not defined for manager/hook %s",
                                        method_name, manager.__class__.__name__)
-                    continue
+            bound = tuple(bound)
+            self._methods[method_name] = bound
+        return bound
 
-                result = method(*args)
-                status = status + result.status
-                all_results[manager.__class__.__name__] = result.to_transport_format()
-                self.__activity_stream.record(method_name + ":" + manager.__class__.__name__,
-                                              args,
-                                              result)
+    @staticmethod
+    def _bulk_call(method, args_list: list, managers: object) -> Result:
+        """
+        Calls a Router method once per element of a bulk request, collecting the individual results
 
-                # Allow reactions to occur in response to result of last action
-                n_priors = n_priors + self._reactions.occur_in_response_to(manager.__class__.__name__, method_name, args, result, n_priors)
+        Parameters
+        ----------
+        method: callable
+            The Router method that handles a single element
+        args_list: list
+            A list of argument lists, one per element
+        managers: object
+            Either the string "any" meaning all managers that implement the method will be called, or a list of
+            manager class names that should be called
 
+        Returns
+        -------
+        Result
+            Result.status is the sum of the individual status values
+            Result.response is a list of the transport format of each individual Result
+        """
+        status = 0
+        all_results = []
+        for args in args_list:
+            result = method(*args, managers)
+            status = status + result.status
+            all_results.append(result.to_transport_format())
         return Result(status, all_results)
 
+    def _if_exists(self, exists_method: str, get_method: str, name: str, managers: object) -> Result:
+        """
+        Calls get_method if exists_method succeeds and every manager that implements it reports a truthy response
+
+        Parameters
+        ----------
+        exists_method: str
+            The name of the Manager method that tests for existence
+        get_method: str
+            The name of the Manager method that retrieves information
+        name: str
+            The user or group name
+        managers: object
+            Either the string "any" meaning all managers that implement the method will be called, or a list of
+            manager class names that should be called
+
+        Returns
+        -------
+        Result
+            The result of get_method, the result of exists_method if it failed, or a Result with status 404 and the
+            exists_method responses if the user or group does not exist
+        """
+        result = self._safe_call(exists_method, [name], managers)
+        if result.is_error():
+            return result
+        for manager_result in result.response.values():
+            if not manager_result["response"]:
+                return Result(404, result.response)
+        return self._safe_call(get_method, [name], managers)
+
     def initialize(self):
         """
         Stub to adhere to general contract. The router is running in a consumer or RPC server so it needs to behave
@@ -162,6 +262,9 @@ class Router:
         """
         Explicitly finalize all managers for clean shutdown
         """
+        if self._hook_executors is not None:
+            for executor in self._hook_executors.values():
+                executor.shutdown(wait=True)
         for manager in self._managers:
             manager.finalize()
 
@@ -212,6 +315,32 @@ class Router:
         """
         return self._safe_call("get_group", [name], managers)
 
+    def get_group_if_exists(self, name: str, managers: object) -> Result:
+        """
+        Tests for the existence of a group, and retrieves the group information if it exists, through each configured
+        Manager. Saves a client the round trip of calling exists_group before get_group.
+
+        Parameters
+        ----------
+        name: str
+            The group name
+        managers: object
+            Either the string "any" meaning all managers that implement the method will be called, or a list of
+            manager class names that should be called
+
+        Returns
+        ---------
+        Result
+            The result of get_group if the group exists. Otherwise, the result of exists_group if it failed, or a
+            Result with status 404 and the exists_group responses if any manager reported that the group does not
+            exist.
+
+        See Also
+        ---------
+        #_if_exists
+        """
+        return self._if_exists("exists_group", "get_group", name, managers)
+
     def list_groups(self, managers: object) -> Result:
         """
         Enumerate all group names that are defined in the backend
@@ -346,6 +475,30 @@ class Router:
         """
         return self._safe_call("add_user", [user_atts], managers)
 
+    def add_users(self, user_atts_list: list, managers: object) -> Result:
+        """
+        Add a list of users through each configured Manager, as if add_user was called for each element
+
+        Parameters
+        ----------
+        user_atts_list : list
+            A list of user properties (see add_user)
+        managers: object
+            Either the string "any" meaning all managers that implement the method will be called, or a list of
+            manager class names that should be called
+
+        Returns
+        ---------
+        Result
+            Result.status is the sum of the status of each add_user call
+            Result.response is a list of the transport format of each add_user Result, in argument order
+
+        See Also
+        ---------
+        #add_user
+        """
+        return self._bulk_call(self.add_user, [[user_atts] for user_atts in user_atts_list], managers)
+
     def update_user(self, user_atts: dict, managers: object) -> Result:
         """
         Update a user through each configured Manager
@@ -393,6 +546,31 @@ class Router:
         """
         return self._safe_call("get_user", [name], managers)
 
+    def get_user_if_exists(self, name: str, managers: object) -> Result:
+        """
+        Tests for the existence of a user, and retrieves the user information if it exists, through each configured
+        Manager. Saves a client the round trip of calling exists_user before get_user.
+
+        Parameters
+        ----------
+        name: str
+            The user name
+        managers: object
+            Either the string "any" meaning all managers that implement the method will be called, or a list of
+            manager class names that should be called
+
+        Returns
+        ---------
+        Result
+            The result of get_user if the user exists. Otherwise, the result of exists_user if it failed, or a Result
+            with status 404 and the exists_user responses if any manager reported that the user does not exist.
+
+        See Also
+        ---------
+        #_if_exists
+        """
+        return self._if_exists("exists_user", "get_user", name, managers)
+
     def list_users(self, with_default_group: str, managers: object) -> Result:
         """
         Enumerate all user names that are defined in the backend
@@ -479,6 +657,30 @@ class Router:
         """
         return self._safe_call("delete_user", [name], managers)
 
+    def delete_users(self, names: list, managers: object) -> Result:
+        """
+        Delete a list of users from each configured Manager, as if delete_user was called for each element
+
+        Parameters
+        ----------
+        names: list
+            The names of the users
+        managers: object
+            Either the string "any" meaning all managers that implement the method will be called, or a list of
+            manager class names that should be called
+
+        Returns
+        ---------
+        Result
+            Result.status is the sum of the status of each delete_user call
+            Result.response is a list of the transport format of each delete_user Result, in argument order
+
+        See Also
+        ---------
+        #delete_user
+        """
+        return self._bulk_call(self.delete_user, [[name] for name in names], managers)
+
     def exists_user(self, name: str, managers: object) -> Result:
         """
         Test for existence of a user through each configured Manager
@@ -552,6 +754,32 @@ class Router:
         """
         return self._safe_call("associate_user_to_group", [user_name, group_name], managers)
 
+    def associate_users_to_groups(self, pairs: list, managers: object) -> Result:
+        """
+        Make users members of groups through each configured Manager, as if associate_user_to_group was called for
+        each element
+
+        Parameters
+        ----------
+        pairs: list
+            A list of [user_name, group_name] pairs
+        managers: object
+            Either the string "any" meaning all managers that implement the method will be called, or a list of
+            manager class names that should be called
+
+        Returns
+        ---------
+        Result
+            Result.status is the sum of the status of each associate_user_to_group call
+            Result.response is a list of the transport format of each associate_user_to_group Result, in argument
+            order
+
+        See Also
+        ---------
+        #associate_user_to_group
+        """
+        return self._bulk_call(self.associate_user_to_group, pairs, managers)
+
     def disassociate_user_from_group(self, user_name: str, group_name: str, managers: object) -> Result:
         """
         Remove a user from a group through each configured Manager
@@ -1,19 +1,20 @@
 #!/usr/bin/env python
+import logging
 import pika
 import pika.exceptions
 import uuid
-import yaml
 import time
 from metaroot.api.result import Result
 from metaroot.config import Config
-from metaroot.utils import get_logger
+from metaroot.utils import get_logger, retry_delay
 from metaroot.amqps import get_ssl_context_from_config
 from metaroot.api.notifications import send_email
+from metaroot.wire import DECODING_ERRORS, ENCODING_ERRORS, content_type, decode, encode
 
 
 class RPCClient:
     """
-    An RPC client based on pika that passes YAML messages
+    An RPC client based on pika that passes YAML (or JSON, see metaroot.wire) messages
     """
 
     def __init__(self, config: Config):
@@ -37,6 +38,7 @@ class RPCClient:
         self.callback_queue = None
         self.corr_id = None
         self.response = None
+        self.response_content_type = None
         self.queue = self.config.get_mq_queue_name()
         self.logger = get_logger(RPCClient.__name__,
                                  config.get_log_file(),
@@ -147,6 +149,7 @@ class RPCClient:
             If any underlying operations fail by raising an exception
         """
         if self.corr_id == props.correlation_id:
+            self.response_content_type = props.content_type
             self.response = body
 
     def close(self):
@@ -174,47 +177,45 @@ class RPCClient:
             Result.status is 0 for success, >0 on error
             Result.response is any object returned by the remote method invocation or None
         """
-        # Encode the request dict as YAML
+        # Encode the request dict in the wire format
         try:
-            message = yaml.safe_dump(obj)
-        except yaml.YAMLError as exc:
-            self.logger.error("YAML serialization error: %s", exc)
+            message = encode(obj)
+        except ENCODING_ERRORS as exc:
+            self.logger.error("Serialization error: %s", exc)
             self.logger.error("{0}".format(obj))
             return Result(453, None)
 
+        return self.send_encoded(message)
+
+    def send_encoded(self, message: str) -> Result:
+        """
+        Method to initiate an RPC request that has already been encoded in the wire format
+
+        Parameters
+        ----------
+        message: str
+            An encoded dictionary specifying a remote method name and arguments to invoke
+
+        Returns
+        ----------
+        Result
+            Result.status is 0 for success, >0 on error
+            Result.response is any object returned by the remote method invocation or None
+        """
         self.response = None
         self.corr_id = str(uuid.uuid4())
 
         # Send RPC request to server
-        not_sent = True
-        attempts = 1
-        while not_sent and attempts < 10:
-            try:
-                self.channel.basic_publish(exchange='',
-                                           routing_key=self.queue,
-                                           body=message,
-                                           properties=pika.BasicProperties(
-                                               reply_to=self.callback_queue,
-                                               correlation_id=self.corr_id))
-                not_sent = False
-            except Exception as e:
-                self.logger.info("Failed to send on attempt %d because connection closed. Reconnecting...", attempts)
-                time.sleep((attempts-1)*5)
-                if self.connection.is_closed:
-                    self.connect()
-
-            attempts = attempts + 1
-        if not_sent:
-            self.logger.error("Failed to deliver message %s:%s", self.queue, message.rstrip())
-            send_email(self.config.get("NOTIFY_ON_ERROR"),
-                       "Message delivery failure: " + self.__class__.__name__,
-                       "Failed to deliver message {0}:{1}".format(self.queue, message.rstrip()))
+        if not self._publish(message, True):
             return Result(470, "Message could not be delivered")
 
         # Wait for response
+        # The level is checked once so that the message is only copied by rstrip() when it will be logged
+        debug = self.logger.isEnabledFor(logging.DEBUG)
         attempts = 1
         while self.response is None and attempts < 36:
-            self.logger.debug("Waiting for callback response to %s", str(obj))
+            if debug:
+                self.logger.debug("Waiting for callback response to %s", message.rstrip())
             # Process events in
             self.connection.process_data_events(time_limit=5)
             attempts = attempts + 1
@@ -228,13 +229,83 @@ class RPCClient:
                        "No response received for message {0}:{1}".format(self.queue, message.rstrip()))
             return Result(471, "Operation timed out waiting for a response")
 
-        # Decode the response dict as YAML
+        # Decode the response dict as YAML, or JSON if the server replied with JSON
         try:
-            res_obj = yaml.safe_load(self.response)
+            res_obj = decode(self.response, self.response_content_type)
             return Result.from_transport_format(res_obj)
-        except yaml.YAMLError as exc:
-            self.logger.error("YAML serialization error: %s", exc)
-            self.logger.error("{0}".format(obj))
+        except DECODING_ERRORS as exc:
+            self.logger.error("Response parsing error: %s", exc)
+            self.logger.error("{0}".format(self.response))
             return Result(454, None)
 
+    def send_encoded_oneway(self, message: str) -> Result:
+        """
+        Method to send an RPC request that has already been encoded in the wire format without waiting for a response.
+        The server does not reply to requests sent this way, so the outcome of the remote method invocation is not known.
+
+        Parameters
+        ----------
+        message: str
+            An encoded dictionary specifying a remote method name and arguments to invoke
+
+        Returns
+        ----------
+        Result
+            Result.status is 0 if the request was sent, >0 on error
+            Result.response is None
+        """
+        if not self._publish(message, False):
+            return Result(470, "Message could not be delivered")
+        return Result(0, None)
+
+    def _publish(self, message: str, reply: bool) -> bool:
+        """
+        Publishes a request to the server, reconnecting and retrying if the connection was lost
+
+        Parameters
+        ----------
+        message: str
+            An encoded request
+        reply: bool
+            If True, the request asks the server to reply to this client's callback queue with the current correlation
+            id
+
+        Returns
+        ----------
+        bool
+            True if the request was published, False if it could not be delivered
+        """
+        not_sent = True
+        attempts = 1
+        while not_sent and attempts < 20:
+            try:
+                # Properties are built per attempt because reconnecting declares a new callback queue
+                if reply:
+                    properties = pika.BasicProperties(reply_to=self.callback_queue, correlation_id=self.corr_id,
+                                                      content_type=content_type())
+                else:
+                    properties = pika.BasicProperties(content_type=content_type())
+                self.channel.basic_publish(exchange='',
+                                           routing_key=self.queue,
+                                           body=message,
+                                           properties=properties)
+                not_sent = False
+            except pika.exceptions.AMQPChannelError as e:
+                # The server closed the channel, which trying again will not fix
+                self.logger.error("Failed to send on attempt %d: %r", attempts, e)
+                break
+            except Exception as e:
+                self.logger.info("Failed to send on attempt %d because connection closed. Reconnecting...", attempts)
+                time.sleep(retry_delay(attempts))
+                if self.connection.is_closed:
+                    self.connect()
+
+            attempts = attempts + 1
+        if not_sent:
+            self.logger.error("Failed to deliver message %s:%s", self.queue, message.rstrip())
+            send_email(self.config.get("NOTIFY_ON_ERROR"),
+                       "Message delivery failure: " + self.__class__.__name__,
+                       "Failed to deliver message {0}:{1}".format(self.queue, message.rstrip()))
+            return False
+        return True
 
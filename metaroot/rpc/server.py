@@ -2,15 +2,24 @@ import pika
 import pika.exceptions
 import yaml
 import sys
-import inspect
+import logging
 import time
 import ssl
 import metaroot.config
 import metaroot.utils
+from metaroot.api.actions import action_name
+from metaroot.wire import CLOSE_IMMEDIATELY, DECODING_ERRORS, decode, encode_reply, is_close_immediately
 from metaroot.amqps import get_ssl_context_from_config
 from metaroot.api.notifications import send_email
 
 
+# Long-lived consumer connections use a longer heartbeat, so that a slow handler does not cause a false disconnect,
+# and TCP keepalive, so that a dead peer is noticed without waiting for a heartbeat to time out
+_HEARTBEAT_S = 60
+_BLOCKED_TIMEOUT_S = 300
+_TCP_OPTIONS = {'TCP_KEEPIDLE': 60, 'TCP_KEEPINTVL': 30, 'TCP_KEEPCNT': 5}
+
+
 class RPCServer:
     """
     An RPC server based on pika that maps requests to methods of a "manager" object hosted by the server.
@@ -27,6 +36,14 @@ class RPCServer:
         self._config = None
         self._exit_requested = False
 
+        # The object that methods were last called on, and its dispatch table
+        self._dispatch = (None, {})
+
+        # Built from the configuration by the first call to connect()
+        self._connection_parameters = None
+        self._queue_name = None
+        self._prefetch_count = 1
+
     def __enter__(self):
         """
         Stub for instantiating the server in a "with" statement. No actions necessary/taken.
@@ -87,21 +104,28 @@ class RPCServer:
             self._logger.error("The message does not define an 'action' -> %s", message)
             return self.get_error_response(450)
 
-        # Lookup the requested method in the handler object
-        try:
-            method = getattr(obj, message['action'])
-        except AttributeError:
+        # A batch message carries a list of requests that are each dispatched as if they had arrived separately
+        if message['action'] == 'batch':
+            return self.call_batch(obj, message)
+
+        # Lookup the requested method in the handler object's dispatch table, which is built the first time a method of
+        # the object is called. Actions may be method names or integer Action codes.
+        if self._dispatch[0] is not obj:
+            self._dispatch = (obj, metaroot.utils.build_dispatch_table(obj))
+        action = action_name(message['action'])
+        entry = metaroot.utils.lookup_dispatch_entry(obj, self._dispatch[1], action)
+        if entry is None:
             self._logger.error("The method %s is not defined on the argument object %s",
                                message['action'], type(obj).__name__)
             return self.get_error_response(451)
 
         # Validate arguments match the method signature
-        arguments = inspect.signature(method).parameters
+        method, arguments, signature = entry
         args = []
         for argument in arguments:
             if argument not in message:
                 self._logger.error("Call to method %s.%s%s, no parameter %r in message", type(obj).__name__,
-                                   message['action'], inspect.signature(method), argument)
+                                   message['action'], signature, argument)
                 return self.get_error_response(452)
             args.append(message[argument])
 
@@ -116,6 +140,40 @@ class RPCServer:
                        str(e))
             return self.get_error_response(455)
 
+    def call_batch(self, obj: object, message: dict):
+        """
+        Calls a method of an object for each request in a batch message
+
+        Parameters
+        ----------
+        obj: object
+            An object to invoke methods of
+        message: dict
+            A message whose key 'requests' is a list of messages as accepted by call_method
+
+        Returns
+        ----------
+        dict
+            key status is the sum of the status of each request
+            key response is a list of the result of each request, in the order the requests appear in the batch
+        """
+        if not isinstance(message.get('requests'), list):
+            self._logger.error("The batch message does not define a list of 'requests' -> %s", message)
+            return self.get_error_response(452)
+
+        status = 0
+        responses = []
+        for request in message['requests']:
+            # Batches may not be nested
+            if isinstance(request, dict) and request.get('action') != 'batch':
+                result = self.call_method(obj, request)
+            else:
+                self._logger.error("The batch contains an invalid request -> %s", request)
+                result = self.get_error_response(450)
+            status = status + result["status"]
+            responses.append(result)
+        return {"status": status, "response": responses}
+
     def consume_callback(self, ch, method, props, body):
         """
         Method called when a response is received to a previous request
@@ -127,7 +185,7 @@ class RPCServer:
         method:
             Unused
         props:
-            Unused
+            Properties of the request, including its content type and where to reply
         body: bytearray
             Response to request
 
@@ -138,24 +196,30 @@ class RPCServer:
             it is the return status of the underlying method invocation.
         """
         # If debugging, helpful to print each message consumed
-        self._logger.debug('Consumed message')
-        self._logger.debug("Body: %r", body.decode())
+        # The level is checked first so that the body is only decoded when it will be logged
+        if self._logger.isEnabledFor(logging.DEBUG):
+            self._logger.debug('Consumed message')
+            self._logger.debug("Body: %r", body.decode())
 
         # result is initially success, and will either be 453 for message parsing exception, or the return result of
         # the operation that is requested by the message
         result = {"status": 0, "response": None}
 
-        # Parse message body as YAML
-        try:
-            message = yaml.safe_load(body)
-        except yaml.YAMLError as exc:
-            self._logger.error("YAML parsing error: %s", exc)
-            self._logger.error(body.decode())
-            result = self.get_error_response(450)
-            message = None
+        # Parse message body as YAML, or JSON if the content type says so. CLOSE_IMMEDIATELY is recognized without
+        # parsing.
+        if is_close_immediately(body):
+            message = CLOSE_IMMEDIATELY
+        else:
+            try:
+                message = decode(body, props.content_type)
+            except DECODING_ERRORS as exc:
+                self._logger.error("Message parsing error: %s", exc)
+                self._logger.error(body.decode())
+                result = self.get_error_response(450)
+                message = None
 
         # Handle special case of the CLOSE_IMMEDIATELY message that shuts down the Server
-        if message == "CLOSE_IMMEDIATELY":
+        if message == CLOSE_IMMEDIATELY:
             ch.basic_publish(exchange='',
                              routing_key=props.reply_to,
                              properties=pika.BasicProperties(correlation_id=props.correlation_id),
@@ -169,11 +233,14 @@ class RPCServer:
         if result["status"] == 0:
             result = self.call_method(self._handler, message)
 
-        # RPC response sent to callers private queue as YAML document
-        ch.basic_publish(exchange='',
-                         routing_key=props.reply_to,
-                         properties=pika.BasicProperties(correlation_id=props.correlation_id),
-                         body=yaml.safe_dump(result))
+        # RPC response sent to callers private queue in the format of the request, unless the request was sent one-way
+        if props.reply_to is not None:
+            reply, reply_content_type = encode_reply(result, props.content_type)
+            ch.basic_publish(exchange='',
+                             routing_key=props.reply_to,
+                             properties=pika.BasicProperties(correlation_id=props.correlation_id,
+                                                             content_type=reply_content_type),
+                             body=reply)
 
         # Acknowledge message consumed
         ch.basic_ack(delivery_tag=method.delivery_tag)
@@ -192,23 +259,65 @@ class RPCServer:
             Unused
         """
         self._logger.info("Shutting down...")
+
+        # Stop the reconnect loop in start() from trying again
+        self._exit_requested = True
+
         try:
             self._handler.finalize()
         except Exception as e:
             self._logger.info("handler.finalize() raised an exception")
             self._logger.exception(e)
 
-        try:
-            self._channel.stop_consuming()
-        except Exception as e:
-            self._logger.info("channel.stop_consuming() raised an exception")
-            self._logger.exception(e)
+        # The reconnect loop may have just replaced or closed the channel and connection, so only touch them if
+        # they are still open
+        channel = self._channel
+        if channel is not None and channel.is_open:
+            try:
+                channel.stop_consuming()
+            except Exception as e:
+                self._logger.info("channel.stop_consuming() raised an exception")
+                self._logger.exception(e)
+
+        connection = self._connection
+        if connection is not None and connection.is_open:
+            try:
+                connection.close()
+            except Exception as e:
+                self._logger.info("connection.close() raised an exception")
+                self._logger.exception(e)
+
+    def _get_connection_parameters(self) -> pika.ConnectionParameters:
+        """
+        Builds the parameters for connecting to the message queue server from the configuration the first time they
+        are needed, so that reconnect attempts reuse them rather than reading the configuration again
 
-        try:
-            self._connection.close()
-        except Exception as e:
-            self._logger.info("connection.close() raised an exception")
-            self._logger.exception(e)
+        Returns
+        -------
+        pika.ConnectionParameters
+            The parameters of every connection made by this server
+        """
+        if self._connection_parameters is None:
+            self._queue_name = self._config.get_mq_queue_name()
+            self._prefetch_count = self._config.get_prefetch_count()
+
+            # Pretty standard connection stuff (user, password, etc)
+            credentials = pika.PlainCredentials(self._config.get_mq_user(), self._config.get_mq_pass())
+
+            ssl_options = None
+            if self._config.get_ssl():
+                self._logger.info("Will attempt to connect to AMQP server using SSL")
+                ssl_options = pika.SSLOptions(get_ssl_context_from_config(self._config))
+
+            self._connection_parameters = pika.ConnectionParameters(host=self._config.get_mq_host(),
+                                                                    port=self._config.get_mq_port(),
+                                                                    virtual_host='/',
+                                                                    credentials=credentials,
+                                                                    ssl_options=ssl_options,
+                                                                    heartbeat=_HEARTBEAT_S,
+                                                                    blocked_connection_timeout=_BLOCKED_TIMEOUT_S,
+                                                                    tcp_options=_TCP_OPTIONS)
+        return self._connection_parameters
 
     def connect(self):
         """
@@ -222,32 +331,19 @@ class RPCServer:
             If the connection could not be established
         """
         try:
-            # Pretty standard connection stuff (user, password, etc)
-            credentials = pika.PlainCredentials(self._config.get_mq_user(), self._config.get_mq_pass())
-
-            ssl_options = None
-            if self._config.get_ssl():
-                self._logger.info("Will attempt to connect to AMQP server using SSL")
-                ssl_options = pika.SSLOptions(get_ssl_context_from_config(self._config))
-
-            parameters = pika.ConnectionParameters(host=self._config.get_mq_host(),
-                                                   port=self._config.get_mq_port(),
-                                                   virtual_host='/',
-                                                   credentials=credentials,
-                                                   ssl_options=ssl_options,
-                                                   heartbeat=30)
-            self._connection = pika.BlockingConnection(parameters)
+            self._connection = pika.BlockingConnection(self._get_connection_parameters())
             self._channel = self._connection.channel()
 
             # Only servers declare queues (not the clients)
-            self._channel.queue_declare(self._config.get_mq_queue_name(),
+            self._channel.queue_declare(self._queue_name,
                                         durable=True)  # request that the queue be persisted to disk
 
-            # Only receive messages if idle
-            self._channel.basic_qos(prefetch_count=1)
+            # By default only receive messages if idle. A larger PREFETCH_COUNT lets the broker send the next messages
+            # while one is being handled, saving a round trip per message; they are still handled one at a time in order
+            self._channel.basic_qos(prefetch_count=self._prefetch_count)
 
             # Attach the callback to handle messages
-            self._channel.basic_consume(queue=self._config.get_mq_queue_name(),
+            self._channel.basic_consume(queue=self._queue_name,
                                         on_message_callback=self.consume_callback)
 
             return True
@@ -290,10 +386,17 @@ class RPCServer:
         # Instantiate an instance of the class specified in the config file that will process messages
         self._handler = metaroot.utils.instantiate_object_from_class_path(self._config.get_mq_handler_class())
         self._handler.initialize()
+        self._dispatch = (self._handler, metaroot.utils.build_dispatch_table(self._handler))
 
         # We want to exit gracefully if a SIGTERM is sent, so configure a handler
         # signal.signal(signal.SIGTERM, self.shutdown)
 
+        # Read once here rather than on every reconnect
+        host = self._config.get_mq_host()
+        port = self._config.get_mq_port()
+        handler_class = self._config.get_mq_handler_class()
+        notify = self._config.get("NOTIFY_ON_ERROR")
+
         # Consume messages, attempting to recover from network dropout
         self._logger.info('starting consume loop for messages of type "%s"...', self._config.get_mq_queue_name())
         connect_attempts = 1
@@ -305,16 +408,10 @@ class RPCServer:
                 time.sleep(connect_attempts * 5)
                 connect_attempts = connect_attempts + 1
             else:
-                self._logger.info("Connected to message host %s:%d after %d attempts",
-                                  self._config.get_mq_host(),
-                                  self._config.get_mq_port(),
-                                  connect_attempts)
-                send_email(self._config.get("NOTIFY_ON_ERROR"),
-                           "RPC Server (re)connect for " + self._config.get_mq_handler_class(),
-                           "Connected to message host {0}:{1} after {2} attempts".format(
-                               self._config.get_mq_host(),
-                               self._config.get_mq_port(),
-                               connect_attempts))
+                self._logger.info("Connected to message host %s:%d after %d attempts", host, port, connect_attempts)
+                send_email(notify,
+                           "RPC Server (re)connect for " + handler_class,
+                           "Connected to message host {0}:{1} after {2} attempts".format(host, port, connect_attempts))
                 connect_attempts = 1
 
                 try:
@@ -331,8 +428,8 @@ class RPCServer:
                 except Exception as e:
                     self._logger.exception(e)
                     self._logger.error("Consume loop broken...will NOT attempt to reconnect")
-                    send_email(self._config.get("NOTIFY_ON_ERROR"),
-                               "RPC Server Exited: "+self._config.get_mq_handler_class(),
+                    send_email(notify,
+                               "RPC Server Exited: "+handler_class,
                                str(e))
                     break
 
@@ -0,0 +1,21 @@
+import unittest
+from metaroot.api.actions import Action, action_name
+from metaroot.router import Router
+
+
+class ActionTest(unittest.TestCase):
+
+    def test_actions_map_to_manager_methods(self):
+        for action in Action:
+            self.assertTrue(callable(getattr(Router, action.name, None)), action.name)
+
+    def test_action_name(self):
+        self.assertEqual("add_group", action_name(Action.add_group.value))
+        self.assertEqual("add_group", action_name("add_group"))
+        self.assertIsNone(action_name(0))
+        self.assertIsNone(action_name(len(Action) + 1))
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(ActionTest)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,138 @@
+import os
+import sqlite3
+import threading
+import time
+import unittest
+from metaroot.activity_stream import ActivityStream
+from metaroot.api.result import Result
+from metaroot.config import get_config
+
+db_file = get_config("ACTIVITYSTREAM").get_activity_stream_db()
+
+
+def count_events() -> int:
+    conn = sqlite3.connect(db_file)
+    n = conn.execute("SELECT COUNT(*) FROM events").fetchone()[0]
+    conn.close()
+    return n
+
+
+class ActivityStreamTest(unittest.TestCase):
+    def tearDown(self):
+        for suffix in ["", "-wal", "-shm"]:
+            if os.path.exists(db_file + suffix):
+                os.remove(db_file + suffix)
+
+    def test_events_are_buffered_until_flush(self):
+        stream = ActivityStream(max_batch=100, max_delay_s=60)
+        stream.info("add_group:Test", {"name": "g1"})
+        stream.record("add_group:Test", {"name": "g2"}, Result(1, "failed"))
+        self.assertEqual(0, count_events())
+        stream.flush()
+        self.assertEqual(2, count_events())
+        stream.close()
+
+    def test_full_batch_is_written(self):
+        stream = ActivityStream(max_batch=3, max_delay_s=60)
+        for i in range(3):
+            stream.info("add_group:Test", {"name": "g{0}".format(i)})
+        attempts = 0
+        while count_events() < 3 and attempts < 50:
+            time.sleep(0.01)
+            attempts = attempts + 1
+        self.assertEqual(3, count_events())
+        stream.close()
+
+    def test_pending_events_are_written_on_close(self):
+        with ActivityStream(max_batch=100, max_delay_s=60) as stream:
+            stream.info("add_group:Test", {"name": "g1"})
+        self.assertEqual(1, count_events())
+
+    def test_pending_events_are_written_on_delete(self):
+        stream = ActivityStream(max_batch=100, max_delay_s=60)
+        stream.info("add_group:Test", {"name": "g1"})
+        del stream
+        self.assertEqual(1, count_events())
+
+    def test_event_encoding(self):
+        before = int(time.time() * 1000000)
+        stream = ActivityStream()
+        stream.error("add_group:Test", {"name": "g1"}, Result(1, "failed"), sync=True)
+        stream.close()
+        conn = sqlite3.connect(db_file)
+        row = conn.execute("SELECT * FROM events").fetchone()
+        conn.close()
+        self.assertLessEqual(before, row[0])
+        self.assertEqual(ActivityStream.ERROR, row[1])
+        self.assertEqual('{"name":"g1"}', row[3])
+        self.assertEqual(1, row[4])
+        self.assertEqual('{"status":1,"response":"failed"}', row[5])
+
+    def test_query(self):
+        with ActivityStream() as stream:
+            stream.info("add_group:Test", {"name": "g1"})
+            stream.error("add_group:Test", {"name": "g2"}, Result(1, "failed"))
+            stream.flush()
+            rows = stream.query("SELECT arguments FROM events WHERE type = ?", (ActivityStream.ERROR,))
+            self.assertEqual([('{"name":"g2"}',)], rows)
+            self.assertRaises(sqlite3.OperationalError, stream.query, "DELETE FROM events")
+
+    def test_review_queries_use_indexes(self):
+        ActivityStream().close()
+        conn = sqlite3.connect(db_file)
+        plan = conn.execute("EXPLAIN QUERY PLAN SELECT * FROM events WHERE type = ? AND eventtime > ?",
+                            (ActivityStream.ERROR, 0)).fetchall()
+        conn.close()
+        self.assertIn("idx_events_type_time", str(plan))
+
+    def test_long_values_are_truncated(self):
+        with ActivityStream() as stream:
+            stream.info("add_users:Test", ["u{0}".format(i) for i in range(10000)], sync=True)
+            row = stream.query("SELECT arguments FROM events")[0]
+        self.assertEqual(4096, len(row[0]))
+
+    def test_overflow_is_dropped(self):
+        stream = ActivityStream(max_batch=100, max_delay_s=60, max_queued=1, drop_on_overflow=True)
+        results = [stream.info("add_group:Test", {"name": "g{0}".format(i)}) for i in range(1000)]
+        self.assertIn(False, results)
+        stream.close()
+
+    def test_sync_bypasses_buffer(self):
+        stream = ActivityStream(max_batch=100, max_delay_s=60)
+        stream.error("add_group:Test", {"name": "g1"}, Result(1, "failed"), sync=True)
+        self.assertEqual(1, count_events())
+        stream.close()
+
+    def test_closed_stream_rejects_events(self):
+        stream = ActivityStream(max_batch=100, max_delay_s=60)
+        stream.close()
+        self.assertRaises(ValueError, stream.info, "add_group:Test", {"name": "g1"})
+        self.assertRaises(ValueError, stream.flush)
+        stream.close()
+
+    def test_close_closes_reader_connections(self):
+        stream = ActivityStream(max_batch=100, max_delay_s=60)
+        reader = threading.Thread(target=stream.query, args=("SELECT COUNT(*) FROM events",))
+        reader.start()
+        reader.join()
+        self.assertEqual(1, len(stream._reader_conns))
+        conn = stream._reader_conns[0]
+        stream.close()
+        self.assertRaises(sqlite3.ProgrammingError, conn.execute, "SELECT 1")
+        self.assertRaises(ValueError, stream.query, "SELECT COUNT(*) FROM events")
+
+    def test_write_errors_are_raised_by_flush(self):
+        stream = ActivityStream(max_batch=100, max_delay_s=60)
+        conn = sqlite3.connect(db_file)
+        conn.execute("DROP TABLE events")
+        conn.commit()
+        conn.close()
+        stream.info("add_group:Test", {"name": "g1"})
+        self.assertRaises(sqlite3.OperationalError, stream.flush)
+        self.assertTrue(stream.info("add_group:Test", {"name": "g2"}))
+        self.assertRaises(sqlite3.OperationalError, stream.close)
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(ActivityStreamTest)
+    unittest.TextTestRunner(verbosity=2).run(suite)
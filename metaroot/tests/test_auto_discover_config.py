@@ -1,3 +1,4 @@
+import io
 import unittest
 import metaroot.config
 
@@ -40,6 +41,32 @@ class MetarootAutoDiscoverConfigTests(unittest.TestCase):
 
         # Custom key/value without a builtin getter
         self.assertEqual("Value1", config.get("CUSTOM1"))
+        self.assertEqual("Value1", config.get("CUSTOM1", None))
+        self.assertIsNone(config.get("NOT_DEFINED", None))
+        self.assertRaises(KeyError, config.get, "NOT_DEFINED")
+
+    def test_config_is_cached_and_read_only(self):
+        config = metaroot.config.get_config("clazz")
+        self.assertIs(config, metaroot.config.get_config("CLAZZ"))
+        self.assertRaises(TypeError, config.populate, {"MQUSER": "other"})
+
+    def test_reload_config(self):
+        config = metaroot.config.get_config("CLAZZ")
+        metaroot.config.reload_config()
+        reloaded = metaroot.config.get_config("CLAZZ")
+        self.assertIsNot(config, reloaded)
+        self.assertEqual(config.get_mq_queue_name(), reloaded.get_mq_queue_name())
+
+    def test_load_metaroot_section(self):
+        stream = io.StringIO("OTHER: &base\n"
+                             "  MQHOST: host\n"
+                             "METAROOT:\n"
+                             "  GLOBAL:\n"
+                             "    <<: *base\n"
+                             "    MQPORT: 1234\n")
+        self.assertEqual({"GLOBAL": {"MQHOST": "host", "MQPORT": 1234}},
+                         metaroot.config._load_metaroot_section(stream))
+        self.assertRaises(KeyError, metaroot.config._load_metaroot_section, io.StringIO("OTHER: 1\n"))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,91 @@
+import unittest
+from unittest import mock
+from metaroot.api.base_client import BaseClient, CallKind
+from metaroot.api.method_client import MethodClientAPI
+from metaroot.api.result import Result
+
+
+class EchoClient:
+    """
+    Stands in for an RPCClient, answering each request in a batch with its action
+    """
+    def __init__(self):
+        self.sent = []
+
+    def send(self, message):
+        self.sent.append(message)
+        return Result(0, [{"status": 0, "response": request["action"]} for request in message["requests"]])
+
+    def send_encoded(self, message):
+        self.sent.append(message)
+        return Result(0, None)
+
+    def send_encoded_oneway(self, message):
+        self.sent.append(message)
+        return Result(0, "oneway")
+
+
+class BatchTest(unittest.TestCase):
+
+    def test_batch_is_one_message(self):
+        client = EchoClient()
+        api = BaseClient(client)
+        with api.batch():
+            add = api.add_group({"name": "g1"})
+            delete = api.delete_user("u1")
+            self.assertFalse(add.done())
+        self.assertEqual(1, len(client.sent))
+        self.assertEqual("batch", client.sent[0]["action"])
+        self.assertEqual(Result(0, "add_group").to_transport_format(), add.result().to_transport_format())
+        self.assertEqual("delete_user", delete.result().response)
+        self.assertEqual("u1", client.sent[0]["requests"][1]["name"])
+
+    def test_requests_outside_batch_are_sent_immediately(self):
+        client = EchoClient()
+        api = BaseClient(client)
+        with api.batch():
+            api.add_group({"name": "g1"})
+        self.assertEqual(0, api.delete_user("u1").status)
+        self.assertEqual(2, len(client.sent))
+
+    def test_batch_is_discarded_on_exception(self):
+        client = EchoClient()
+        api = BaseClient(client)
+        future = None
+        try:
+            with api.batch():
+                future = api.add_group({"name": "g1"})
+                raise ValueError()
+        except ValueError:
+            pass
+        self.assertTrue(future.cancelled())
+        self.assertEqual(0, len(client.sent))
+
+    def test_call_kind_one_way(self):
+        client = EchoClient()
+        api = BaseClient(client)
+        with api.call_kind(CallKind.ONE_WAY):
+            self.assertEqual("oneway", api.delete_user("u1").response)
+            self.assertIsNone(api.add_group({"name": "g1"}).response)
+            with api.call_kind(CallKind.RPC):
+                self.assertIsNone(api.delete_user("u1").response)
+            self.assertEqual("oneway", api.delete_user("u1").response)
+        self.assertIsNone(api.delete_user("u1").response)
+
+    def test_coalesced_call_uses_call_time_state(self):
+        client = EchoClient()
+        with mock.patch("metaroot.api.method_client.get_pool", return_value=client):
+            api = MethodClientAPI(enable_coalesce=True, coalesce_window_s=0.05)
+        with api.call_kind(CallKind.ONE_WAY):
+            future = api.disassociate_user_from_group("u1", "g1")
+
+        # A batch opened after the call does not collect the coalesced request, which is sent one-way
+        with api.batch():
+            self.assertEqual("oneway", future.result(timeout=5).response)
+        self.assertEqual(1, len(client.sent))
+        self.assertIn("disassociate_users_from_group", client.sent[0])
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(BatchTest)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -0,0 +1,35 @@
+import time
+import unittest
+from metaroot.api.cache import TTLCache
+from metaroot.api.result import Result
+
+
+class TTLCacheTest(unittest.TestCase):
+
+    def test_positive_and_negative_lifetimes(self):
+        cache = TTLCache(pos_ttl=60, neg_ttl=0.01)
+        cache.put("u1", ("exists_user", "any"), Result(0, True))
+        cache.put("u2", ("exists_user", "any"), Result(1, False))
+        time.sleep(0.02)
+        self.assertEqual(True, cache.get("u1", ("exists_user", "any")).response)
+        self.assertIsNone(cache.get("u2", ("exists_user", "any")))
+
+    def test_transport_errors_are_not_cached(self):
+        cache = TTLCache()
+        cache.put("u1", ("exists_user", "any"), Result(471, "Operation timed out waiting for a response"))
+        self.assertIsNone(cache.get("u1", ("exists_user", "any")))
+
+    def test_invalidate(self):
+        cache = TTLCache()
+        cache.put("u1", ("exists_user", "any"), Result(0, True))
+        cache.put("u1", ("get_user", "any"), Result(0, {}))
+        cache.put("u2", ("exists_user", "any"), Result(0, True))
+        cache.invalidate(["u1"])
+        self.assertIsNone(cache.get("u1", ("exists_user", "any")))
+        self.assertIsNone(cache.get("u1", ("get_user", "any")))
+        self.assertIsNotNone(cache.get("u2", ("exists_user", "any")))
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(TTLCacheTest)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -1,10 +1,20 @@
 import unittest
-from metaroot.api.notifications import send_email
+from metaroot.api.notifications import send_email, send_email_sync, _format_message
 
 
 class NotificationsTest(unittest.TestCase):
     def test_send_email_fail_address_unresolveable(self):
-        self.assertEqual(False, send_email("foo", "test email", "<i>Test Content</i>"))
+        self.assertEqual(False, send_email("foo", "test email", "<i>Test Content</i>").result(timeout=30))
+
+    def test_send_email_sync_fail_address_unresolveable(self):
+        self.assertEqual(False, send_email_sync("foo", "test email", "<i>Test Content</i>"))
+
+    def test_format_message(self):
+        msg = _format_message("a@b.c", "d@e.f", "Subject", "<i>one</i>\n<i>two</i>")
+        self.assertTrue(msg.startswith(b"Subject: Subject\r\nFrom: a@b.c\r\nTo: d@e.f\r\n"))
+        self.assertTrue(msg.endswith(b"\r\n\r\n<i>one</i>\r\n<i>two</i>"))
+        self.assertIn(b"Subject: =?utf-8?", _format_message("a@b.c", "d@e.f", "Caf\u00e9", ""))
+        self.assertRaises(ValueError, _format_message, "a@b.c", "d@e.f\r\nBcc: x@y.z", "Subject", "")
 
 
 if __name__ == '__main__':
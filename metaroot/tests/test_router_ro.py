@@ -163,6 +163,13 @@ class RouterTest(unittest.TestCase):
             result = router.add_user({}, "any")
             self.assertEqual(470, result.status)
 
+    def test_add_users(self):
+        with Router() as router:
+            result = router.add_users([{}, {}], "any")
+            self.assertNotEqual(0, result.status)
+            self.assertEqual(470, result.response[0]["status"])
+            self.assertEqual(470, result.response[1]["status"])
+
     def test_update_user(self):
         with Router() as router:
             result = router.update_user({}, "any")
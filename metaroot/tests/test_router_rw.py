@@ -134,6 +134,13 @@ class RouterTest(unittest.TestCase):
             self.assertEqual(0, result.response["Handler2"]["status"])
             self.assertEqual("get_group:handler2", result.response["Handler2"]["response"])
 
+    def test_get_group_if_exists(self):
+        with Router() as router:
+            result = router.get_group_if_exists("", "any")
+            self.assertEqual(0, result.status)
+            self.assertEqual("get_group:handler1", result.response["Handler1"]["response"])
+            self.assertEqual("get_group:handler2", result.response["Handler2"]["response"])
+
     def test_get_members(self):
         with Router() as router:
             result = router.get_members("", "any")
@@ -179,6 +186,14 @@ class RouterTest(unittest.TestCase):
             self.assertEqual(0, result.response["Handler2"]["status"])
             self.assertEqual("add_user:handler2", result.response["Handler2"]["response"])
 
+    def test_add_users(self):
+        with Router() as router:
+            result = router.add_users([{}, {}], "any")
+            self.assertEqual(0, result.status)
+            self.assertEqual(2, len(result.response))
+            self.assertEqual("add_user:handler1", result.response[1]["response"]["Handler1"]["response"])
+            self.assertEqual("add_user:handler2", result.response[1]["response"]["Handler2"]["response"])
+
     def test_update_user(self):
         with Router() as router:
             result = router.update_user({}, "any")
@@ -206,6 +221,14 @@ class RouterTest(unittest.TestCase):
             self.assertEqual(0, result.response["Handler2"]["status"])
             self.assertEqual("delete_user:handler2", result.response["Handler2"]["response"])
 
+    def test_delete_users(self):
+        with Router() as router:
+            result = router.delete_users(["", ""], "any")
+            self.assertEqual(0, result.status)
+            self.assertEqual(2, len(result.response))
+            self.assertEqual("delete_user:handler1", result.response[0]["response"]["Handler1"]["response"])
+            self.assertEqual("delete_user:handler2", result.response[0]["response"]["Handler2"]["response"])
+
     def test_exists_user(self):
         with Router() as router:
             result = router.exists_user("", "any")
@@ -233,6 +256,16 @@ class RouterTest(unittest.TestCase):
             self.assertEqual(0, result.response["Handler2"]["status"])
             self.assertEqual("associate_user_to_group:handler2", result.response["Handler2"]["response"])
 
+    def test_associate_users_to_groups(self):
+        with Router() as router:
+            result = router.associate_users_to_groups([["", ""], ["", ""]], "any")
+            self.assertEqual(0, result.status)
+            self.assertEqual(2, len(result.response))
+            self.assertEqual("associate_user_to_group:handler1",
+                             result.response[0]["response"]["Handler1"]["response"])
+            self.assertEqual("associate_user_to_group:handler2",
+                             result.response[0]["response"]["Handler2"]["response"])
+
     def test_disassociate_user_from_group(self):
         with Router() as router:
             result = router.disassociate_user_from_group("", "", "any")
@@ -0,0 +1,61 @@
+import unittest
+import yaml
+import metaroot.wire
+from metaroot.wire import CLOSE_IMMEDIATELY, JSON_CONTENT_TYPE, content_type, decode, encode, encode_reply, \
+    encode_with_prefix, is_close_immediately
+
+_ADD_GROUP = yaml.safe_dump({'action': 'add_group'})
+
+
+class WireTest(unittest.TestCase):
+
+    def tearDown(self):
+        metaroot.wire.WIRE_FORMAT = "yaml"
+
+    def test_json_is_decoded_by_yaml_servers(self):
+        metaroot.wire.WIRE_FORMAT = "json"
+        fields = {'group_atts': {'name': 'g1', 'gid': 1001, 'desc': 'a "quoted"\tvalue: # ü'}, 'managers': ['M1']}
+        expected = dict(fields, action='add_group')
+        self.assertEqual(expected, yaml.safe_load(encode_with_prefix(_ADD_GROUP, fields)))
+        self.assertEqual(expected, yaml.safe_load(encode(expected)))
+        self.assertEqual(expected, decode(encode_with_prefix(_ADD_GROUP, fields).encode()))
+
+    def test_yaml(self):
+        fields = {'name': 'u1', 'managers': 'any'}
+        self.assertEqual(dict(fields, action='add_group'), yaml.safe_load(encode_with_prefix(_ADD_GROUP, fields)))
+        self.assertEqual(dict(fields, action='add_group'), decode(encode_with_prefix(_ADD_GROUP, fields).encode()))
+
+    def test_json_content_type(self):
+        self.assertIsNone(content_type())
+        metaroot.wire.WIRE_FORMAT = "json"
+        self.assertEqual(JSON_CONTENT_TYPE, content_type())
+        fields = {'name': 'u\u00fc', 'managers': ['M1']}
+        message = encode_with_prefix(_ADD_GROUP, fields).encode()
+        self.assertEqual(dict(fields, action='add_group'), decode(message, JSON_CONTENT_TYPE))
+
+    def test_reply_in_request_format(self):
+        result = {"status": 0, "response": ["a", 1]}
+        reply, reply_content_type = encode_reply(result, JSON_CONTENT_TYPE)
+        self.assertEqual(JSON_CONTENT_TYPE, reply_content_type)
+        self.assertEqual(result, decode(reply, reply_content_type))
+
+        reply, reply_content_type = encode_reply(result, None)
+        self.assertIsNone(reply_content_type)
+        self.assertEqual(result, decode(reply, reply_content_type))
+
+        # Values that JSON cannot represent fall back to YAML
+        reply, reply_content_type = encode_reply({"status": 0, "response": b"raw"}, JSON_CONTENT_TYPE)
+        self.assertIsNone(reply_content_type)
+
+    def test_close_immediately(self):
+        for wire_format in ("yaml", "json"):
+            metaroot.wire.WIRE_FORMAT = wire_format
+            self.assertTrue(is_close_immediately(encode(CLOSE_IMMEDIATELY).encode()))
+        self.assertTrue(is_close_immediately(bytearray(b"CLOSE_IMMEDIATELY")))
+        self.assertFalse(is_close_immediately(b"CLOSE_LATER"))
+        self.assertFalse(is_close_immediately(encode({"action": CLOSE_IMMEDIATELY}).encode()))
+
+
+if __name__ == '__main__':
+    suite = unittest.TestLoader().loadTestsFromTestCase(WireTest)
+    unittest.TextTestRunner(verbosity=2).run(suite)
@@ -2,6 +2,8 @@ import sys
 import logging
 import inspect
 import datetime
+import functools
+import random
 from importlib import import_module
 
 loggers = {}
@@ -78,6 +80,28 @@ def get_logger(name: str, file_path: str, file_level="INFO", screen_level="INFO"
         return logger
 
 
+def retry_delay(attempt: int, base: float = 0.001, cap: float = 5.0) -> float:
+    """
+    Computes how long to wait before retrying a failed operation, doubling the wait after each failure up to a limit.
+    The wait is randomized so that clients that failed together do not all retry at the same moment.
+
+    Parameters
+    ----------
+    attempt: int
+        The number of the attempt that failed, starting at 1
+    base: float
+        The wait in seconds after the first failure, before randomization
+    cap: float
+        The longest wait in seconds, before randomization
+
+    Returns
+    ----------
+    float
+        A number of seconds between half and one and a half times min(cap, base * 2^(attempt-1))
+    """
+    return min(cap, base * 2 ** (attempt - 1)) * (0.5 + random.random())
+
+
 def instantiate_object_from_class_path(path: str):
     """
     Instantiates an instance of a class specified as a string
@@ -97,10 +121,115 @@ def instantiate_object_from_class_path(path: str):
     Exception
         Will raise an exception if the class is invalid, cannot be imported or cannot be instantiated
     """
+    return get_class_from_class_path(path)()
+
+
+@functools.lru_cache(maxsize=None)
+def get_class_from_class_path(path: str):
+    """
+    Imports the class specified as a string. Classes are cached by path, so the module is only imported and searched
+    the first time each path is requested in a process.
+
+    Parameters
+    ----------
+    path: str
+        The path/name of the class as a dot delimited string, e.g. io.stream.Decoder
+
+    Returns
+    ----------
+    type
+         The specified class
+
+    Raises
+    ----------
+    Exception
+        Will raise an exception if the class is invalid or cannot be imported
+    """
     module_path, _, class_name = path.rpartition(".")
     mod = import_module(module_path)
-    clazz = getattr(mod, class_name)
-    return clazz()
+    return getattr(mod, class_name)
+
+
+def build_dispatch_table(obj: object) -> dict:
+    """
+    Maps the name of each public method of an object's class to the bound method and the names of its parameters, so
+    that messages are dispatched without looking up or inspecting the method each time. Methods are found on the class,
+    so properties are not evaluated; callables set on the instance are added by lookup_dispatch_entry when requested.
+
+    Parameters
+    ----------
+    obj: object
+        The object whose methods are called
+
+    Returns
+    ----------
+    dict
+        Method name -> (bound method, tuple of parameter names, signature). The signature is kept for error messages so
+        that the method does not need to be inspected again
+    """
+    table = {}
+    for name, _ in inspect.getmembers(type(obj), callable):
+        if not name.startswith('_'):
+            entry = _dispatch_entry(obj, name)
+            if entry is not None:
+                table[name] = entry
+    return table
+
+
+def lookup_dispatch_entry(obj: object, table: dict, action: object) -> tuple:
+    """
+    Looks up a requested method in a table built by build_dispatch_table. A public name that is not in the table is
+    looked up once on the object, and added to the table if it is a method.
+
+    Parameters
+    ----------
+    obj: object
+        The object whose methods are called
+    table: dict
+        The dispatch table of obj
+    action: object
+        The requested method name
+
+    Returns
+    ----------
+    tuple
+        (bound method, tuple of parameter names, signature), or None if obj has no public method named action
+    """
+    if not isinstance(action, str):
+        return None
+    entry = table.get(action)
+    if entry is None and not action.startswith('_'):
+        entry = _dispatch_entry(obj, action)
+        if entry is not None:
+            table[action] = entry
+    return entry
+
+
+def _dispatch_entry(obj: object, name: str) -> tuple:
+    """
+    Creates the dispatch table entry for a method of an object
+
+    Parameters
+    ----------
+    obj: object
+        The object whose methods are called
+    name: str
+        The method name
+
+    Returns
+    ----------
+    tuple
+        (bound method, tuple of parameter names, signature), or None if the attribute is not a method
+    """
+    try:
+        method = getattr(obj, name)
+        if callable(method):
+            signature = inspect.signature(method)
+            return method, tuple(signature.parameters), signature
+    except Exception:
+        # Attributes that cannot be read, and callables without a signature, cannot be requested
+        pass
+    return None
 
 
 def create_rpc_wrapper(clazz):
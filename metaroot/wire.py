@@ -0,0 +1,198 @@
+import functools
+import json
+import os
+import yaml
+
+# libyaml's loader and dumper are much faster than the pure Python ones, and produce the same results for safe YAML
+try:
+    from yaml import CSafeDumper as _SafeDumper, CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeDumper as _SafeDumper, SafeLoader as _SafeLoader
+
+# Format used to encode messages sent to the message queue: "yaml" (default) or "json". JSON documents are also YAML
+# documents, so servers that decode messages with decode() accept either format and the switch can be made (or
+# rolled back) one client at a time. Values should be limited to strings, integers, booleans, None, lists and dicts.
+WIRE_FORMAT = os.getenv("METAROOT_WIRE_FORMAT", "yaml").lower()
+
+# Exceptions raised when an object cannot be encoded in any of the formats
+ENCODING_ERRORS = (yaml.YAMLError, TypeError, ValueError)
+
+# Exceptions raised when a message cannot be decoded from any of the formats
+DECODING_ERRORS = (yaml.YAMLError, ValueError)
+
+# AMQP content type of JSON messages, which receivers decode with the json module rather than a YAML parser. Messages
+# without a content type are decoded as YAML, so senders that predate content types remain compatible.
+JSON_CONTENT_TYPE = "application/json"
+
+# Message that asks an RPC server or event consumer to stop
+CLOSE_IMMEDIATELY = "CLOSE_IMMEDIATELY"
+
+# CLOSE_IMMEDIATELY as encoded by either wire format, so that receivers can recognize it without decoding the message
+_CLOSE_IMMEDIATELY_BODIES = frozenset(body.encode("utf-8") for body in (yaml.safe_dump(CLOSE_IMMEDIATELY),
+                                                                        yaml.dump(CLOSE_IMMEDIATELY,
+                                                                                  Dumper=_SafeDumper),
+                                                                        json.dumps(CLOSE_IMMEDIATELY),
+                                                                        CLOSE_IMMEDIATELY))
+_CLOSE_IMMEDIATELY_MAX_LEN = max(len(body) for body in _CLOSE_IMMEDIATELY_BODIES)
+
+
+def content_type() -> str:
+    """
+    Returns the AMQP content type of messages encoded in the configured wire format
+
+    Returns
+    -------
+    str
+        JSON_CONTENT_TYPE for JSON, or None for YAML
+    """
+    if WIRE_FORMAT == "json":
+        return JSON_CONTENT_TYPE
+    return None
+
+
+def encode(obj: object) -> str:
+    """
+    Encodes a message in the configured wire format
+
+    Parameters
+    ----------
+    obj: object
+        The message
+
+    Returns
+    -------
+    str
+        The encoded message
+
+    Raises
+    ------
+    ENCODING_ERRORS
+        If the message cannot be encoded
+    """
+    if WIRE_FORMAT == "json":
+        return json.dumps(obj, ensure_ascii=False)
+    return yaml.dump(obj, Dumper=_SafeDumper)
+
+
+def is_close_immediately(data: object) -> bool:
+    """
+    Checks whether an undecoded message is CLOSE_IMMEDIATELY in one of its usual encodings
+
+    Parameters
+    ----------
+    data: object
+        The message as str, bytes or bytearray
+
+    Returns
+    -------
+    bool
+        True if the message is CLOSE_IMMEDIATELY. False for any other message, and for unusual encodings of
+        CLOSE_IMMEDIATELY, which are only recognized after decoding.
+    """
+    if len(data) > _CLOSE_IMMEDIATELY_MAX_LEN:
+        return False
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    return bytes(data) in _CLOSE_IMMEDIATELY_BODIES
+
+
+def decode(data: object, data_content_type: str = None) -> object:
+    """
+    Decodes a message encoded in either wire format
+
+    Parameters
+    ----------
+    data: object
+        The message as str or bytes
+    data_content_type: str
+        The AMQP content type of the message. JSON_CONTENT_TYPE messages are decoded with the json module, and all
+        others with the YAML parser (which also accepts JSON).
+
+    Returns
+    -------
+    object
+        The decoded message
+
+    Raises
+    ------
+    DECODING_ERRORS
+        If the message is not valid in its format
+    """
+    if data_content_type == JSON_CONTENT_TYPE:
+        if isinstance(data, bytes):
+            data = data.decode("utf-8")
+        return json.loads(data)
+    return yaml.load(data, Loader=_SafeLoader)
+
+
+def encode_reply(obj: object, request_content_type: str) -> tuple:
+    """
+    Encodes the reply to a request in the format of the request, so that JSON clients also get fast to decode replies
+
+    Parameters
+    ----------
+    obj: object
+        The reply
+    request_content_type: str
+        The AMQP content type of the request
+
+    Returns
+    -------
+    tuple
+        The encoded reply, and its AMQP content type. Replies that cannot be encoded as JSON fall back to YAML.
+
+    Raises
+    ------
+    ENCODING_ERRORS
+        If the reply cannot be encoded as YAML
+    """
+    if request_content_type == JSON_CONTENT_TYPE:
+        try:
+            return json.dumps(obj, ensure_ascii=False), JSON_CONTENT_TYPE
+        except (TypeError, ValueError):
+            pass
+    return yaml.dump(obj, Dumper=_SafeDumper), None
+
+
+@functools.lru_cache(maxsize=None)
+def _json_prefix(prefix: str) -> str:
+    """
+    Converts the YAML encoding of the constant part of a request to an unterminated JSON object
+
+    Parameters
+    ----------
+    prefix: str
+        The YAML encoding of a dict
+
+    Returns
+    -------
+    str
+        The opening brace and members of the equivalent JSON object, followed by a comma
+    """
+    return json.dumps(yaml.safe_load(prefix), ensure_ascii=False)[:-1] + ", "
+
+
+def encode_with_prefix(prefix: str, fields: dict) -> str:
+    """
+    Encodes a request whose constant part was encoded ahead of time, in the configured wire format
+
+    Parameters
+    ----------
+    prefix: str
+        The YAML encoding of the constant part of the request (i.e., the 'action')
+    fields: dict
+        The remaining keys of the request, which must not be empty
+
+    Returns
+    -------
+    str
+        The encoded request
+
+    Raises
+    ------
+    ENCODING_ERRORS
+        If the request cannot be encoded
+    """
+    if WIRE_FORMAT == "json":
+        return _json_prefix(prefix) + json.dumps(fields, ensure_ascii=False)[1:]
+    return prefix + yaml.dump(fields, Dumper=_SafeDumper)
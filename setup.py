@@ -1,8 +1,18 @@
+import os
 import setuptools
 
 with open("README.md", "r") as fh:
     long_description = fh.read()
 
+# Setting METAROOT_CYTHONIZE=1 compiles the per-request client glue and the activity stream with Cython. The modules
+# are compiled as-is, so the pure Python package behaves identically and is used when Cython is not requested.
+ext_modules = []
+if os.environ.get("METAROOT_CYTHONIZE") == "1":
+    from Cython.Build import cythonize
+    ext_modules = cythonize(["metaroot/api/base_client.py",
+                             "metaroot/activity_stream.py"],
+                            compiler_directives={"language_level": 3})
+
 setuptools.setup(
     name="metaroot",
     version="0.5.0",
@@ -13,6 +23,7 @@ setuptools.setup(
     long_description_content_type="text/markdown",
     url="https://github.com/cwru-rcci/metaroot",
     packages=setuptools.find_packages(),
+    ext_modules=ext_modules,
     classifiers=[
         "Development Status :: 3 - Alpha",
         "Intended Audience :: Developers",